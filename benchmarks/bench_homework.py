@@ -0,0 +1,205 @@
+"""Замеры производительности горячих путей модуля homework.
+
+Запуск из корня проекта:
+    python benchmarks/bench_homework.py            # сравнить с базой
+    python benchmarks/bench_homework.py --save     # записать новую базу
+
+Время сравнивается с базой в долях эталонного цикла, замеренного в тех же
+повторах: абсолютные наносекунды зависят от загрузки машины и выводятся
+только для справки.
+"""
+import argparse
+import importlib
+import json
+import sys
+import tracemalloc
+from functools import partial
+from itertools import cycle, islice
+from pathlib import Path
+from timeit import Timer
+from typing import Callable
+
+BASE_DIR = Path(__file__).resolve(strict=True).parent.parent
+sys.path.append(str(BASE_DIR))
+homework = importlib.import_module('homework')
+
+BASELINE_PATH: Path = Path(__file__).with_name('baseline.json')
+SIZES: tuple[int, ...] = (1, 10_000, 1_000_000)
+CHUNK_SIZE: int = 10_000
+MEMORY_SIZE: int = 10_000
+REPEATS: int = 7
+TOLERANCE: float = 0.5
+
+PACKAGES: dict[str, list[list[float]]] = {
+    'SWM': [[720, 1, 80, 25, 40], [420, 4, 20, 42, 4], [1206, 12, 6, 12, 6]],
+    'RUN': [[15000, 1, 75], [9000, 1, 75], [1206, 12, 6]],
+    'WLK': [[9000, 1, 75, 180], [420, 4, 20, 42], [1206, 12, 6, 12]],
+}
+MIXED_PACKAGES: list[tuple[str, list[float]]] = [
+    (workout_type, data)
+    for workout_type, rows in PACKAGES.items()
+    for data in rows
+]
+
+Setup = Callable[[int], list]
+Operation = Callable[[list], list]
+
+
+def make_packages(size: int) -> list:
+    """Подготовить смешанные пакеты датчиков."""
+    return list(islice(cycle(MIXED_PACKAGES), size))
+
+
+def make_trainings(size: int) -> list:
+    """Подготовить смешанные тренировки."""
+    return [homework.read_package(*package)
+            for package in make_packages(size)]
+
+
+def make_typed_trainings(workout_type: str) -> Setup:
+    """Подготовить тренировки одного типа."""
+    def setup(size: int) -> list:
+        return [homework.read_package(workout_type, data)
+                for data in islice(cycle(PACKAGES[workout_type]), size)]
+    return setup
+
+
+def make_messages(size: int) -> list:
+    """Подготовить информационные сообщения."""
+    return [training.show_training_info()
+            for training in make_trainings(size)]
+
+
+def read_packages(packages: list) -> list:
+    return [homework.read_package(*package) for package in packages]
+
+
+def get_spent_calories(trainings: list) -> list:
+    return [training.get_spent_calories() for training in trainings]
+
+
+def show_training_info(trainings: list) -> list:
+    return [training.show_training_info() for training in trainings]
+
+
+def get_message(messages: list) -> list:
+    return [info.get_message() for info in messages]
+
+
+CASES: dict[str, tuple[Setup, Operation]] = {
+    'read_package': (make_packages, read_packages),
+    'Running.get_spent_calories': (
+        make_typed_trainings('RUN'), get_spent_calories
+    ),
+    'SportsWalking.get_spent_calories': (
+        make_typed_trainings('WLK'), get_spent_calories
+    ),
+    'Swimming.get_spent_calories': (
+        make_typed_trainings('SWM'), get_spent_calories
+    ),
+    'Training.show_training_info': (make_trainings, show_training_info),
+    'InfoMessage.get_message': (make_messages, get_message),
+}
+
+
+def calibrate(items: list) -> list:
+    """Эталонная работа интерпретатора, не зависящая от homework."""
+    return [(index * 0.65 / 1000, str(index)) for index in items]
+
+
+def measure_latency(setup: Setup,
+                    operation: Operation,
+                    size: int
+                    ) -> tuple[float, float]:
+    """Получить лучшее из повторов время записи и эталона в наносекундах."""
+    items = setup(size)
+    number = max(1, CHUNK_SIZE // size)
+    timer = Timer(partial(operation, items))
+    reference = Timer(partial(calibrate, range(CHUNK_SIZE)))
+    elapsed, calibration = [], []
+    for _ in range(REPEATS):
+        calibration.append(reference.timeit(number=1))
+        elapsed.append(timer.timeit(number=number))
+    return (min(elapsed) / (size * number) * 1e9,
+            min(calibration) / CHUNK_SIZE * 1e9)
+
+
+def measure_memory(setup: Setup, operation: Operation) -> float:
+    """Получить объём памяти результатов на одну запись в байтах."""
+    items = setup(MEMORY_SIZE)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    results = operation(items)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del results
+    return (after - before) / MEMORY_SIZE
+
+
+def run_benchmarks(sizes: tuple[int, ...]) -> dict[str, dict[str, float]]:
+    """Замерить все горячие пути на заданных объёмах."""
+    report = {}
+    for case, (setup, operation) in CASES.items():
+        report[case] = {}
+        for size in sizes:
+            latency, calibration = measure_latency(setup, operation, size)
+            report[case][f'ns_per_record_{size}'] = latency
+            report[case][f'relative_cost_{size}'] = latency / calibration
+        report[case]['bytes_per_record'] = measure_memory(setup, operation)
+    return report
+
+
+def find_regressions(report: dict[str, dict[str, float]],
+                     baseline: dict[str, dict[str, float]],
+                     tolerance: float
+                     ) -> list[str]:
+    """Найти замеры, ухудшившиеся сильнее допустимого."""
+    regressions = []
+    for case, metrics in report.items():
+        for metric, value in metrics.items():
+            if metric.startswith('ns_per_record_'):
+                continue
+            expected = baseline.get(case, {}).get(metric)
+            if expected is not None and value > expected * (1 + tolerance):
+                regressions.append(
+                    f'{case} {metric}: {value:.1f} > {expected:.1f}'
+                )
+    return regressions
+
+
+def print_report(report: dict[str, dict[str, float]]) -> None:
+    """Вывести таблицу замеров."""
+    for case, metrics in report.items():
+        values = '; '.join(f'{metric}: {value:.1f}'
+                           for metric, value in metrics.items())
+        print(f'{case}: {values}')
+
+
+def main() -> int:
+    """Запустить замеры и сравнить их с базой."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    parser.add_argument('--save', action='store_true',
+                        help='записать результаты как новую базу')
+    args = parser.parse_args()
+    report = run_benchmarks(tuple(args.sizes))
+    print_report(report)
+    if args.save:
+        baseline = {case: {metric: round(value, 2)
+                           for metric, value in metrics.items()}
+                    for case, metrics in report.items()}
+        BASELINE_PATH.write_text(json.dumps(baseline, indent=4) + '\n')
+        return 0
+    if not BASELINE_PATH.exists():
+        print('База не найдена, запустите с --save')
+        return 1
+    baseline = json.loads(BASELINE_PATH.read_text())
+    regressions = find_regressions(report, baseline, args.tolerance)
+    for regression in regressions:
+        print(f'Регрессия: {regression}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,4 +1,254 @@
-from dataclasses import dataclass, asdict
+import ast
+import asyncio
+import csv
+import hashlib
+import inspect
+import json
+import math
+import mmap
+import os
+import shutil
+import sqlite3
+import struct
+import sys
+import zipfile
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import ExitStack, suppress
+from dataclasses import dataclass
+from functools import partial, wraps
+from heapq import heappush, heapreplace
+from itertools import compress, count, islice, repeat
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+from string import Formatter
+from tempfile import TemporaryFile
+from time import monotonic, perf_counter
+from typing import (BinaryIO, Callable, Hashable, Iterable, Iterator,
+                    Mapping, Optional, Sequence, TextIO, Union)
+
+Columns = Mapping[str, Sequence[float]]
+Package = tuple[str, list]
+Source = Union[str, Path, Iterable[str]]
+MessageRow = tuple[str, float, float, float, float]
+DevicePackage = tuple[Hashable, str, list]
+AggregateKey = tuple[Hashable, Hashable, str]
+
+FIELD_ATTRIBUTES: dict[str, str] = {
+    'duration': 'duration_h',
+    'weight': 'weight_kg',
+    'height': 'height_cm',
+}
+ATTRIBUTE_FIELDS: dict[str, str] = {
+    attribute: field for field, attribute in FIELD_ATTRIBUTES.items()
+}
+LOG_CODE_SIZE: int = 3
+SERVER_HOST: str = '127.0.0.1'
+SERVER_PORT: int = 8765
+SERVER_QUEUE_SIZE: int = 100
+MESSAGE_FIELDS: tuple[str, ...] = (
+    'training_type', 'duration', 'distance', 'speed', 'calories'
+)
+NPY_MAGIC: bytes = b'\x93NUMPY\x01\x00'
+NPY_ALIGNMENT: int = 64
+UNKNOWN_LABEL: str = 'unknown'
+LATENCY_BUCKETS: tuple[float, ...] = (
+    1e-6, 5e-6, 1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 1e-2, float('inf')
+)
+
+
+def escape_label_value(value: str) -> str:
+    """Экранировать значение метки для формата Prometheus."""
+    return (value.replace('\\', '\\\\')
+            .replace('"', '\\"')
+            .replace('\n', '\\n'))
+
+
+class CallStats:
+    """Счётчики и гистограмма задержек одного горячего пути."""
+
+    def __init__(self) -> None:
+        self.calls: int = 0
+        self.errors: int = 0
+        self.total_time: float = 0.0
+        self.buckets: list[int] = [0] * len(LATENCY_BUCKETS)
+
+    def observe(self, elapsed: float, failed: bool) -> None:
+        """Учесть один вызов."""
+        self.calls += 1
+        self.errors += failed
+        self.total_time += elapsed
+        self.buckets[bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+
+    def as_dict(self) -> dict:
+        """Вернуть счётчики в виде словаря."""
+        return {'calls': self.calls,
+                'errors': self.errors,
+                'total_time': self.total_time,
+                'buckets': dict(zip(map(str, LATENCY_BUCKETS),
+                                    self.buckets))}
+
+
+class Instrumentation:
+    """Сбор метрик горячих путей, по умолчанию выключен."""
+
+    def __init__(self) -> None:
+        self.enabled: bool = False
+        self.stats: dict[tuple[str, str], CallStats] = {}
+        self.originals: list[tuple[object, str, Callable]] = []
+
+    def enable(self) -> None:
+        """Включить сбор метрик, обернув отмеченные горячие пути."""
+        if self.enabled:
+            return
+        self.enabled = True
+        for owner in iter_instrumented_owners():
+            self.install(owner)
+
+    def disable(self) -> None:
+        """Выключить сбор метрик и вернуть исходные функции."""
+        for owner, name, func in reversed(self.originals):
+            setattr(owner, name, func)
+        self.originals.clear()
+        self.enabled = False
+
+    def install(self, owner: object) -> None:
+        """Обернуть отмеченные функции модуля или класса."""
+        for name, func in list(vars(owner).items()):
+            marker = getattr(func, 'instrumentation', None)
+            if marker is None or getattr(func, 'is_instrumented', False):
+                continue
+            self.originals.append((owner, name, func))
+            setattr(owner, name, self.wrap(func, *marker))
+
+    def wrap(self,
+             func: Callable,
+             path: str,
+             get_label: Callable[..., str]
+             ) -> Callable:
+        """Получить обёртку, учитывающую вызовы функции."""
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            failed = True
+            start = perf_counter()
+            try:
+                result = func(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                self.record(path, get_label(*args, **kwargs),
+                            perf_counter() - start, failed)
+
+        wrapper.is_instrumented = True
+        return wrapper
+
+    def reset(self) -> None:
+        """Сбросить накопленные метрики."""
+        self.stats.clear()
+
+    def record(self,
+               path: str,
+               label: str,
+               elapsed: float,
+               failed: bool
+               ) -> None:
+        """Учесть вызов горячего пути с меткой типа тренировки."""
+        key = (path, label)
+        if key not in self.stats:
+            self.stats[key] = CallStats()
+        self.stats[key].observe(elapsed, failed)
+
+    def snapshot(self) -> dict[str, dict[str, dict]]:
+        """Вернуть снимок метрик по путям и меткам."""
+        result: dict[str, dict[str, dict]] = {}
+        for (path, label), stats in self.stats.items():
+            result.setdefault(path, {})[label] = stats.as_dict()
+        return result
+
+    def to_json(self) -> str:
+        """Выгрузить снимок метрик в JSON."""
+        return json.dumps(self.snapshot(), ensure_ascii=False)
+
+    def to_prometheus(self) -> str:
+        """Выгрузить метрики в текстовом формате Prometheus."""
+        series = [(f'path="{escape_label_value(path)}",'
+                   f'label="{escape_label_value(label)}"', stats)
+                  for (path, label), stats in self.stats.items()]
+        lines = ['# TYPE homework_calls_total counter']
+        lines.extend(f'homework_calls_total{{{labels}}} {stats.calls}'
+                     for labels, stats in series)
+        lines.append('# TYPE homework_errors_total counter')
+        lines.extend(f'homework_errors_total{{{labels}}} {stats.errors}'
+                     for labels, stats in series)
+        lines.append('# TYPE homework_latency_seconds histogram')
+        for labels, stats in series:
+            cumulative = 0
+            for bound, calls in zip(LATENCY_BUCKETS, stats.buckets):
+                cumulative += calls
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'homework_latency_seconds_bucket'
+                             f'{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f'homework_latency_seconds_sum{{{labels}}} '
+                         f'{stats.total_time!r}')
+            lines.append(f'homework_latency_seconds_count{{{labels}}} '
+                         f'{stats.calls}')
+        return '\n'.join(lines) + '\n'
+
+
+INSTRUMENTATION = Instrumentation()
+
+
+def instrumented(path: str,
+                 get_label: Callable[..., str]
+                 ) -> Callable[[Callable], Callable]:
+    """Отметить горячий путь; обёртка ставится только при включении."""
+    def decorator(func: Callable) -> Callable:
+        if not hasattr(func, 'instrumentation'):
+            func.instrumentation = (path, get_label)
+        return func
+    return decorator
+
+
+def iter_instrumented_owners() -> Iterator[object]:
+    """Перечислить модуль и его классы вместе с подклассами."""
+    module = sys.modules[__name__]
+    yield module
+    classes = [value for value in vars(module).values()
+               if isinstance(value, type) and value.__module__ == __name__]
+    seen: set[type] = set()
+    while classes:
+        cls = classes.pop()
+        if cls not in seen:
+            seen.add(cls)
+            classes.extend(cls.__subclasses__())
+            yield cls
+
+
+def get_training_label(training, *args, **kwargs) -> str:
+    """Получить метку метрик для тренировки или строки таблицы."""
+    if isinstance(training, TrainingRow):
+        return training._table.training_type.__name__
+    return type(training).__name__
+
+
+def get_message_label(info: 'InfoMessage') -> str:
+    """Получить метку метрик для сообщения."""
+    return info.training_type
+
+
+def accepts_argument(method: Callable, name: str) -> bool:
+    """Проверить, принимает ли метод аргумент с таким именем."""
+    return name in inspect.signature(method).parameters
+
+
+def get_package_label(workout_type: str, *args, **kwargs) -> str:
+    """Получить метку метрик для пакета; чужие коды сводятся в одну."""
+    if isinstance(workout_type, str) and workout_type in TYPE_TRAINING:
+        return workout_type
+    return UNKNOWN_LABEL
 
 
 @dataclass
@@ -16,8 +266,40 @@ class InfoMessage:
                     'Ср. скорость: {speed:.3f} км/ч; '
                     'Потрачено ккал: {calories:.3f}.')
 
+    @instrumented('get_message', get_message_label)
     def get_message(self) -> str:
-        return self.message.format(**asdict(self))
+        return self.message.format(**vars(self))
+
+
+def compile_message_template(template: str) -> Callable[..., str]:
+    """Подготовить шаблон сообщения к позиционной подстановке."""
+    parts = []
+    for literal, field, spec, conversion in Formatter().parse(template):
+        parts.append(literal.replace('{', '{{').replace('}', '}}'))
+        if field is None:
+            continue
+        parts.append('{%d%s%s}' % (MESSAGE_FIELDS.index(field),
+                                   f'!{conversion}' if conversion else '',
+                                   f':{spec}' if spec else ''))
+    return ''.join(parts).format
+
+
+render_message: Callable[..., str] = compile_message_template(
+    InfoMessage.message
+)
+
+
+@dataclass
+class BatchInfo:
+    """Результаты пакетного расчёта тренировок одного типа."""
+    training_type: str
+    duration: array
+    distance: array
+    speed: array
+    calories: array
+
+
+TYPE_TRAINING: dict[str, type['Training']] = {}
 
 
 class Training:
@@ -25,6 +307,32 @@ class Training:
     LEN_STEP: float = 0.65
     M_IN_KM: int = 1000
     H_IN_M: int = 60
+    CODE: Optional[str] = None
+    FIELDS: tuple[str, ...] = ('action', 'duration', 'weight')
+    PACKET_FORMAT: str = '<ddd'
+    POSITIVE_FIELDS: tuple[str, ...] = ('duration',)
+    PASSES_DISTANCE: bool = True
+    PASSES_SPEED: bool = False
+
+    def __init_subclass__(cls, code: Optional[str] = None, **kwargs) -> None:
+        """Зарегистрировать тип тренировки под кодом пакета."""
+        super().__init_subclass__(**kwargs)
+        cls.CODE = code
+        cls.FIELDS = tuple(inspect.signature(cls).parameters)
+        if 'PACKET_FORMAT' not in cls.__dict__:
+            cls.PACKET_FORMAT = '<' + 'd' * len(cls.FIELDS)
+        if 'get_spent_calories' in cls.__dict__:
+            instrumented('get_spent_calories', get_training_label)(
+                cls.__dict__['get_spent_calories'])
+            if INSTRUMENTATION.enabled:
+                INSTRUMENTATION.install(cls)
+        cls.PASSES_DISTANCE = accepts_argument(cls.get_mean_speed, 'distance')
+        cls.PASSES_SPEED = accepts_argument(cls.get_spent_calories, 'speed')
+        if code is None:
+            return
+        if code in TYPE_TRAINING:
+            raise ValueError(f'Код тренировки {code} уже занят')
+        TYPE_TRAINING[code] = cls
 
     def __init__(self,
                  action: int,
@@ -40,44 +348,113 @@ class Training:
         distance = self.action * self.LEN_STEP / self.M_IN_KM
         return distance
 
-    def get_mean_speed(self) -> float:
+    def get_mean_speed(self, distance: Optional[float] = None) -> float:
         """Получить среднюю скорость движения."""
-        avg_speed = self.get_distance() / self.duration_h
+        if distance is None:
+            distance = self.get_distance()
+        avg_speed = distance / self.duration_h
         return avg_speed
 
+    @instrumented('get_spent_calories', get_training_label)
     def get_spent_calories(self) -> float:
         raise NotImplementedError('Калории не определены')
         """Получить количество затраченных калорий."""
 
+    @classmethod
+    def get_batch_distance(cls, columns: Columns) -> array:
+        """Получить дистанции пакета тренировок в км."""
+        len_step, m_in_km = cls.LEN_STEP, cls.M_IN_KM
+        return array('d', [action * len_step / m_in_km
+                           for action in columns['action']])
+
+    @classmethod
+    def get_batch_mean_speed(cls,
+                             columns: Columns,
+                             distances: array
+                             ) -> array:
+        """Получить средние скорости пакета тренировок."""
+        return array('d', [distance / duration
+                           for distance, duration
+                           in zip(distances, columns['duration'])])
+
+    @classmethod
+    def get_batch_spent_calories(cls,
+                                 columns: Columns,
+                                 speeds: array
+                                 ) -> array:
+        """Получить затраченные калории пакета тренировок."""
+        raise NotImplementedError('Калории не определены')
+
+    @classmethod
+    def compute_batch(cls, columns: Columns) -> BatchInfo:
+        """Рассчитать показатели пакета тренировок."""
+        distances = cls.get_batch_distance(columns)
+        speeds = cls.get_batch_mean_speed(columns, distances)
+        return BatchInfo(cls.__name__,
+                         array('d', columns['duration']),
+                         distances,
+                         speeds,
+                         cls.get_batch_spent_calories(columns, speeds)
+                         )
+
+    @instrumented('show_training_info', get_training_label)
     def show_training_info(self) -> InfoMessage:
         """Вернуть информационное сообщение о выполненной тренировке."""
+        distance = self.get_distance()
+        if self.PASSES_DISTANCE:
+            speed = self.get_mean_speed(distance)
+        else:
+            speed = self.get_mean_speed()
+        if self.PASSES_SPEED:
+            calories = self.get_spent_calories(speed)
+        else:
+            calories = self.get_spent_calories()
         return InfoMessage(self.__class__.__name__,
                            self.duration_h,
-                           self.get_distance(),
-                           self.get_mean_speed(),
-                           self.get_spent_calories()
+                           distance,
+                           speed,
+                           calories
                            )
 
 
-class Running(Training):
+class Running(Training, code='RUN'):
     """Тренировка: бег."""
     CALORIES_MEAN_SPEED_MULTIPLIER: int = 18
     CALORIES_MEAN_SPEED_SHIFT: int = 20
 
-    def get_spent_calories(self) -> float:
+    def get_spent_calories(self, speed: Optional[float] = None) -> float:
+        if speed is None:
+            speed = self.get_mean_speed()
         calories_run = ((self.CALORIES_MEAN_SPEED_MULTIPLIER
-                        * self.get_mean_speed()
+                        * speed
                         - self.CALORIES_MEAN_SPEED_SHIFT)
                         * self.weight_kg / self.M_IN_KM
                         * (self.duration_h * self.H_IN_M)
                         )
         return calories_run
 
+    @classmethod
+    def get_batch_spent_calories(cls,
+                                 columns: Columns,
+                                 speeds: array
+                                 ) -> array:
+        multiplier = cls.CALORIES_MEAN_SPEED_MULTIPLIER
+        shift = cls.CALORIES_MEAN_SPEED_SHIFT
+        m_in_km, h_in_m = cls.M_IN_KM, cls.H_IN_M
+        return array('d', [(multiplier * speed - shift)
+                           * weight / m_in_km
+                           * (duration * h_in_m)
+                           for speed, weight, duration
+                           in zip(speeds,
+                                  columns['weight'],
+                                  columns['duration'])])
 
-class SportsWalking(Training):
+
+class SportsWalking(Training, code='WLK'):
     """Тренировка: спортивная ходьба."""
     CALORIES_WALKING_COEFFICIENT_1: float = 0.035
     CALORIES_WALKING_COEFFICIENT_2: float = 0.029
+    POSITIVE_FIELDS: tuple[str, ...] = ('duration', 'height')
 
     def __init__(self, action: int,
                  duration: float,
@@ -87,10 +464,12 @@ class SportsWalking(Training):
         super().__init__(action, duration, weight)
         self.height_cm = height
 
-    def get_spent_calories(self) -> float:
+    def get_spent_calories(self, speed: Optional[float] = None) -> float:
+        if speed is None:
+            speed = self.get_mean_speed()
         calories_walk = ((self.CALORIES_WALKING_COEFFICIENT_1
                          * self.weight_kg
-                         + (self.get_mean_speed() ** 2
+                         + (speed ** 2
                           // self.height_cm)
                          * self.CALORIES_WALKING_COEFFICIENT_2
                          * self.weight_kg)
@@ -98,8 +477,26 @@ class SportsWalking(Training):
                          )
         return calories_walk
 
+    @classmethod
+    def get_batch_spent_calories(cls,
+                                 columns: Columns,
+                                 speeds: array
+                                 ) -> array:
+        coefficient_1 = cls.CALORIES_WALKING_COEFFICIENT_1
+        coefficient_2 = cls.CALORIES_WALKING_COEFFICIENT_2
+        h_in_m = cls.H_IN_M
+        return array('d', [(coefficient_1 * weight
+                            + (speed ** 2 // height)
+                            * coefficient_2 * weight)
+                           * (duration * h_in_m)
+                           for speed, weight, height, duration
+                           in zip(speeds,
+                                  columns['weight'],
+                                  columns['height'],
+                                  columns['duration'])])
+
 
-class Swimming(Training):
+class Swimming(Training, code='SWM'):
     """Тренировка: плавание."""
     LEN_STEP: float = 1.38
     CALORIES_SWIMMING_COEFFICIENT_1: float = 1.1
@@ -115,15 +512,29 @@ class Swimming(Training):
         self.length_pool: float = length_pool
         self.count_pool: float = count_pool
 
-    def get_spent_calories(self) -> float:
-        calories_swim = ((self.get_mean_speed()
+    def get_spent_calories(self, speed: Optional[float] = None) -> float:
+        if speed is None:
+            speed = self.get_mean_speed()
+        calories_swim = ((speed
                          + self.CALORIES_SWIMMING_COEFFICIENT_1)
                          * self.CALORIES_SWIMMING_COEFFICIENT_2
                          * self.weight_kg
                          )
         return calories_swim
 
-    def get_mean_speed(self) -> float:
+    @classmethod
+    def get_batch_spent_calories(cls,
+                                 columns: Columns,
+                                 speeds: array
+                                 ) -> array:
+        coefficient_1 = cls.CALORIES_SWIMMING_COEFFICIENT_1
+        coefficient_2 = cls.CALORIES_SWIMMING_COEFFICIENT_2
+        return array('d', [(speed + coefficient_1)
+                           * coefficient_2 * weight
+                           for speed, weight
+                           in zip(speeds, columns['weight'])])
+
+    def get_mean_speed(self, distance: Optional[float] = None) -> float:
         avg_speed_swim = (
             self.length_pool
             * self.count_pool
@@ -132,19 +543,1538 @@ class Swimming(Training):
         )
         return avg_speed_swim
 
+    @classmethod
+    def get_batch_mean_speed(cls,
+                             columns: Columns,
+                             distances: array
+                             ) -> array:
+        m_in_km = cls.M_IN_KM
+        return array('d', [length_pool * count_pool / m_in_km / duration
+                           for length_pool, count_pool, duration
+                           in zip(columns['length_pool'],
+                                  columns['count_pool'],
+                                  columns['duration'])])
+
+
+def get_training_type(workout_type: str) -> type[Training]:
+    """Получить класс тренировки по её коду."""
+    if workout_type not in TYPE_TRAINING:
+        raise KeyError(
+            f'Нет такого типа тренировки,'
+            f'вам доступны только {TYPE_TRAINING.keys()}')
+    return TYPE_TRAINING[workout_type]
+
 
+def check_package_length(training_type: type[Training],
+                         data: Sequence[float]
+                         ) -> None:
+    """Проверить количество полей в пакете."""
+    if len(data) != len(training_type.FIELDS):
+        raise ValueError(
+            f'Для {training_type.__name__} ожидаются поля '
+            f'{training_type.FIELDS}, получено значений: {len(data)}')
+
+
+@instrumented('read_package', get_package_label)
 def read_package(workout_type: str, data: list) -> Training:
     """Прочитать данные полученные от датчиков."""
-    type_training: dict[str, type[Training]] = {
-        'SWM': Swimming,
-        'RUN': Running,
-        'WLK': SportsWalking
+    training_type = get_training_type(workout_type)
+    check_package_length(training_type, data)
+    return training_type(*data)
+
+
+def group_packages(packages: Iterable[Package]) -> dict[str, list]:
+    """Сгруппировать данные пакетов по кодам тренировок."""
+    groups: defaultdict[str, list] = defaultdict(list)
+    for workout_type, data in packages:
+        groups[workout_type].append(data)
+    for workout_type, rows in groups.items():
+        training_type = get_training_type(workout_type)
+        for data in rows:
+            check_package_length(training_type, data)
+    return dict(groups)
+
+
+def read_packages(packages: Iterable[Package]) -> dict[str, list[Training]]:
+    """Прочитать смешанный набор пакетов с группировкой по кодам."""
+    return {
+        workout_type: [TYPE_TRAINING[workout_type](*data) for data in rows]
+        for workout_type, rows in group_packages(packages).items()
     }
-    if workout_type not in type_training:
-        raise KeyError(
-            f'Нет такого типа тренировки,'
-            f'вам доступны только {type_training.keys()}')
-    return type_training[workout_type](*data)
+
+
+def compute_batch(workout_type: str, columns: Columns) -> BatchInfo:
+    """Рассчитать показатели пакета тренировок одного типа."""
+    return get_training_type(workout_type).compute_batch(columns)
+
+
+def compute_packages(packages: Iterable[Package]) -> dict[str, BatchInfo]:
+    """Рассчитать смешанный набор пакетов по колонкам каждого типа."""
+    results = {}
+    for workout_type, rows in group_packages(packages).items():
+        training_type = TYPE_TRAINING[workout_type]
+        columns = dict(zip(training_type.FIELDS, zip(*rows)))
+        results[workout_type] = training_type.compute_batch(columns)
+    return results
+
+
+class TrainingRow:
+    """Представление одной тренировки колоночного хранилища."""
+    __slots__ = ('_table', '_index')
+
+    def __init__(self, table: 'TrainingTable', index: int) -> None:
+        self._table = table
+        self._index = index
+
+    def __getattr__(self, name: str):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        field = ATTRIBUTE_FIELDS.get(name, name)
+        columns = self._table.columns
+        if field in columns:
+            return columns[field][self._index]
+        return getattr(self._table.training_type, name)
+
+    def get_distance(self) -> float:
+        """Получить дистанцию в км."""
+        return self._table.training_type.get_distance(self)
+
+    def get_mean_speed(self) -> float:
+        """Получить среднюю скорость движения."""
+        return self._table.training_type.get_mean_speed(self)
+
+    def get_spent_calories(self) -> float:
+        """Получить количество затраченных калорий."""
+        return self._table.training_type.get_spent_calories(self)
+
+    def show_training_info(self) -> InfoMessage:
+        """Вернуть информационное сообщение о выполненной тренировке."""
+        return InfoMessage(self._table.training_type.__name__,
+                           self.duration_h,
+                           self.get_distance(),
+                           self.get_mean_speed(),
+                           self.get_spent_calories()
+                           )
+
+
+class TrainingTable:
+    """Колонки тренировок одного типа в типизированных массивах."""
+
+    def __init__(self, training_type: type[Training]) -> None:
+        self.training_type: type[Training] = training_type
+        self.columns: dict[str, array] = {
+            field: array('d')
+            for field in training_type.FIELDS
+        }
+
+    def __len__(self) -> int:
+        return len(self.columns['action'])
+
+    def __getitem__(self, index: int) -> TrainingRow:
+        if not -len(self) <= index < len(self):
+            raise IndexError('Нет тренировки с таким номером')
+        return TrainingRow(self, index % len(self))
+
+    def __iter__(self) -> Iterator[TrainingRow]:
+        for index in range(len(self)):
+            yield TrainingRow(self, index)
+
+    def append_data(self, data: Sequence[float]) -> TrainingRow:
+        """Добавить тренировку из данных пакета."""
+        check_package_length(self.training_type, data)
+        for column, value in zip(self.columns.values(), data):
+            column.append(value)
+        return TrainingRow(self, len(self) - 1)
+
+    def append(self, training: Training) -> TrainingRow:
+        """Добавить тренировку из готового объекта."""
+        return self.append_data([
+            getattr(training, FIELD_ATTRIBUTES.get(field, field))
+            for field in self.columns
+        ])
+
+    def compute(self) -> BatchInfo:
+        """Рассчитать показатели всех тренировок таблицы."""
+        return self.training_type.compute_batch(self.columns)
+
+
+class TrainingStore:
+    """Колоночное хранилище тренировок всех типов."""
+
+    def __init__(self) -> None:
+        self.tables: dict[type[Training], TrainingTable] = {}
+
+    def __len__(self) -> int:
+        return sum(len(table) for table in self.tables.values())
+
+    def __iter__(self) -> Iterator[TrainingRow]:
+        for table in self.tables.values():
+            yield from table
+
+    def get_table(self, training_type: type[Training]) -> TrainingTable:
+        """Получить таблицу для класса тренировки."""
+        if training_type not in self.tables:
+            self.tables[training_type] = TrainingTable(training_type)
+        return self.tables[training_type]
+
+    def add_package(self, workout_type: str, data: list) -> TrainingRow:
+        """Добавить тренировку из пакета датчиков."""
+        table = self.get_table(get_training_type(workout_type))
+        return table.append_data(data)
+
+    def add_training(self, training: Training) -> TrainingRow:
+        """Добавить тренировку из готового объекта."""
+        return self.get_table(type(training)).append(training)
+
+
+class LiveTraining:
+    """Тренировка в процессе с пошаговым обновлением показателей."""
+    DELTA_FIELDS: tuple[str, ...] = ('action', 'duration', 'count_pool')
+
+    def __init__(self, training: Training) -> None:
+        self.training: Training = training
+        self.updates: int = 0
+
+    @classmethod
+    def start(cls, workout_type: str, data: list) -> 'LiveTraining':
+        """Начать тренировку по первому пакету датчиков."""
+        return cls(read_package(workout_type, data))
+
+    def update(self, **deltas: float) -> None:
+        """Добавить приращения показателей датчиков: все или ни одного."""
+        training = self.training
+        values: dict[str, float] = {}
+        for field, delta in deltas.items():
+            attribute = FIELD_ATTRIBUTES.get(field, field)
+            if field not in self.DELTA_FIELDS or not hasattr(training,
+                                                             attribute):
+                raise ValueError(
+                    f'Поле {field} нельзя обновить '
+                    f'для {type(training).__name__}')
+            values[attribute] = getattr(training, attribute) + delta
+        for attribute, value in values.items():
+            setattr(training, attribute, value)
+        self.updates += 1
+
+    def snapshot(self) -> InfoMessage:
+        """Вернуть сообщение о тренировке на текущий момент."""
+        return self.training.show_training_info()
+
+
+@dataclass
+class TrainingTotals:
+    """Накопленные итоги тренировок."""
+    count: int = 0
+    duration: float = 0.0
+    distance: float = 0.0
+    weighted_speed: float = 0.0
+    calories: float = 0.0
+
+    def add(self,
+            duration: float,
+            distance: float,
+            speed: float,
+            calories: float
+            ) -> None:
+        """Учесть одну тренировку."""
+        self.count += 1
+        self.duration += duration
+        self.distance += distance
+        self.weighted_speed += speed * duration
+        self.calories += calories
+
+    def merge(self, other: 'TrainingTotals') -> None:
+        """Добавить итоги, накопленные в другом месте."""
+        self.count += other.count
+        self.duration += other.duration
+        self.distance += other.distance
+        self.weighted_speed += other.weighted_speed
+        self.calories += other.calories
+
+    def get_mean_speed(self) -> float:
+        """Получить среднюю скорость, взвешенную по длительности."""
+        return self.weighted_speed / self.duration
+
+
+class TrainingAggregator:
+    """Потоковые итоги по пользователю, дню и типу тренировки."""
+
+    def __init__(self) -> None:
+        self.totals: dict[AggregateKey, TrainingTotals] = {}
+
+    def get_totals(self, key: AggregateKey) -> TrainingTotals:
+        """Получить итоги по ключу, создав их при необходимости."""
+        if key not in self.totals:
+            self.totals[key] = TrainingTotals()
+        return self.totals[key]
+
+    def add(self,
+            info: InfoMessage,
+            user: Hashable = None,
+            day: Hashable = None
+            ) -> None:
+        """Учесть сообщение о тренировке."""
+        self.get_totals((user, day, info.training_type)).add(
+            info.duration, info.distance, info.speed, info.calories
+        )
+
+    def add_batch(self,
+                  batch: BatchInfo,
+                  users: Optional[Iterable[Hashable]] = None,
+                  days: Optional[Iterable[Hashable]] = None
+                  ) -> None:
+        """Учесть результаты пакетного расчёта."""
+        rows = zip(repeat(None) if users is None else users,
+                   repeat(None) if days is None else days,
+                   batch.duration, batch.distance,
+                   batch.speed, batch.calories)
+        for user, day, *values in rows:
+            self.get_totals((user, day, batch.training_type)).add(*values)
+
+    def merge(self, other: 'TrainingAggregator') -> 'TrainingAggregator':
+        """Объединить с частичными итогами другого агрегатора."""
+        for key, totals in other.totals.items():
+            self.get_totals(key).merge(totals)
+        return self
+
+    def summary(self) -> dict[AggregateKey, InfoMessage]:
+        """Вернуть итоги в виде информационных сообщений."""
+        return {
+            key: InfoMessage(key[2], totals.duration, totals.distance,
+                             totals.get_mean_speed(), totals.calories)
+            for key, totals in self.totals.items()
+        }
+
+
+class ResultCache:
+    """Кэш готовых сообщений по содержимому пакета."""
+
+    def __init__(self,
+                 maxsize: int = 10000,
+                 path: Optional[Union[str, Path]] = None
+                 ) -> None:
+        self.maxsize: int = maxsize
+        self.entries: OrderedDict[str, InfoMessage] = OrderedDict()
+        self.hits: int = 0
+        self.disk_hits: int = 0
+        self.misses: int = 0
+        self.connection: Optional[sqlite3.Connection] = None
+        if path is not None:
+            self.connection = sqlite3.connect(path, isolation_level=None)
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('PRAGMA synchronous=NORMAL')
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS results '
+                '(key TEXT PRIMARY KEY, message TEXT NOT NULL)'
+            )
+
+    def __enter__(self) -> 'ResultCache':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    @staticmethod
+    def make_key(workout_type: str, data: Sequence[float]) -> str:
+        """Получить ключ пакета по его содержимому."""
+        payload = json.dumps([workout_type, [float(value) for value in data]])
+        return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+    def get(self, workout_type: str, data: Sequence[float]) -> InfoMessage:
+        """Получить сообщение для пакета, рассчитав его при промахе."""
+        key = self.make_key(workout_type, data)
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        info = self.load(key)
+        if info is None:
+            self.misses += 1
+            info = read_package(workout_type, data).show_training_info()
+            self.save(key, info)
+        else:
+            self.disk_hits += 1
+        self.remember(key, info)
+        return info
+
+    def remember(self, key: str, info: InfoMessage) -> None:
+        """Положить сообщение в память, вытеснив самое старое."""
+        self.entries[key] = info
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def load(self, key: str) -> Optional[InfoMessage]:
+        """Прочитать сообщение с диска."""
+        if self.connection is None:
+            return None
+        row = self.connection.execute(
+            'SELECT message FROM results WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return InfoMessage(*json.loads(row[0]))
+
+    def save(self, key: str, info: InfoMessage) -> None:
+        """Записать сообщение на диск сразу, без общей транзакции."""
+        if self.connection is None:
+            return
+        fields = [getattr(info, field) for field in MESSAGE_FIELDS]
+        self.connection.execute(
+            'INSERT OR REPLACE INTO results VALUES (?, ?)',
+            (key, json.dumps(fields))
+        )
+
+    def get_stats(self) -> dict[str, int]:
+        """Вернуть счётчики попаданий и промахов."""
+        return {'hits': self.hits, 'disk_hits': self.disk_hits,
+                'misses': self.misses, 'size': len(self.entries)}
+
+    def flush(self) -> None:
+        """Перенести журнал дискового уровня в основной файл."""
+        if self.connection is not None:
+            self.connection.execute('PRAGMA wal_checkpoint(PASSIVE)')
+
+    def close(self) -> None:
+        """Закрыть дисковый уровень."""
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+@dataclass
+class QuarantinedPackage:
+    """Пакет, отклонённый при проверке, с кодом причины."""
+    index: int
+    workout_type: str
+    data: list
+    reason: str
+
+
+@dataclass
+class ValidatedPackages:
+    """Результат проверки набора пакетов."""
+    columns: dict[str, dict[str, array]]
+    indexes: dict[str, array]
+    quarantine: list[QuarantinedPackage]
+
+    def compute(self) -> dict[str, BatchInfo]:
+        """Рассчитать показатели всех прошедших проверку пакетов."""
+        return {workout_type: compute_batch(workout_type, columns)
+                for workout_type, columns in self.columns.items()}
+
+
+def get_package_problem(workout_type: str, data: list) -> Optional[str]:
+    """Получить код структурной ошибки пакета."""
+    if not isinstance(workout_type, str):
+        return 'type_not_string'
+    if workout_type not in TYPE_TRAINING:
+        return 'unknown_type'
+    if not isinstance(data, (list, tuple)):
+        return 'data_not_sequence'
+    if len(data) != len(TYPE_TRAINING[workout_type].FIELDS):
+        return 'wrong_length'
+    if not all(type(value) in (int, float) for value in data):
+        return 'not_number'
+    try:
+        array('d', data)
+    except OverflowError:
+        return 'number_too_large'
+    return None
+
+
+def get_column_problems(training_type: type[Training],
+                        columns: dict[str, array]
+                        ) -> list[Optional[str]]:
+    """Получить коды ошибок значений по маскам колонок."""
+    problems: list[Optional[str]] = [None] * len(columns['action'])
+    for field in training_type.FIELDS:
+        mask = map(math.isfinite, columns[field])
+        problems = [problem or (None if valid else f'{field}_not_finite')
+                    for problem, valid in zip(problems, mask)]
+    for field in training_type.POSITIVE_FIELDS:
+        mask = [value > 0 for value in columns[field]]
+        problems = [problem or (None if valid else f'{field}_not_positive')
+                    for problem, valid in zip(problems, mask)]
+    return problems
+
+
+def validate_packages(packages: Iterable[Package]) -> ValidatedPackages:
+    """Проверить набор пакетов и отделить некорректные в карантин."""
+    quarantine: list[QuarantinedPackage] = []
+    groups: defaultdict[str, list[tuple[int, list]]] = defaultdict(list)
+    for index, (workout_type, data) in enumerate(packages):
+        problem = get_package_problem(workout_type, data)
+        if problem is None:
+            groups[workout_type].append((index, data))
+        else:
+            quarantine.append(
+                QuarantinedPackage(index, workout_type, data, problem))
+    result = ValidatedPackages({}, {}, quarantine)
+    for workout_type, rows in groups.items():
+        training_type = TYPE_TRAINING[workout_type]
+        indexes, data_rows = zip(*rows)
+        columns = {field: array('d', values) for field, values
+                   in zip(training_type.FIELDS, zip(*data_rows))}
+        problems = get_column_problems(training_type, columns)
+        mask = [problem is None for problem in problems]
+        quarantine.extend(
+            QuarantinedPackage(index, workout_type, data, problem)
+            for index, data, problem in zip(indexes, data_rows, problems)
+            if problem is not None
+        )
+        if any(mask):
+            result.indexes[workout_type] = array(
+                'q', compress(indexes, mask))
+            result.columns[workout_type] = {
+                field: array('d', compress(column, mask))
+                for field, column in columns.items()}
+    quarantine.sort(key=lambda package: package.index)
+    return result
+
+
+def parse_number(value: str) -> Union[int, float]:
+    """Преобразовать поле пакета в число."""
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+
+def parse_package_line(line: str) -> Package:
+    """Разобрать строку журнала в формате CSV или JSONL."""
+    line = line.strip()
+    if not line:
+        raise ValueError('Пустая строка пакета')
+    if line[0] == '[':
+        workout_type, data = json.loads(line)
+        return workout_type, data
+    if line[0] == '{':
+        package = json.loads(line)
+        return package['workout_type'], package['data']
+    workout_type, *data = line.split(',')
+    return workout_type.strip(), [parse_number(value) for value in data]
+
+
+def iter_lines(source: Source) -> Iterator[str]:
+    """Лениво прочитать строки из файла или итерируемого объекта."""
+    if isinstance(source, (str, Path)):
+        with open(source, encoding='utf-8') as log:
+            yield from log
+    else:
+        yield from source
+
+
+def iter_packages(source: Source) -> Iterator[Package]:
+    """Лениво прочитать пакеты датчиков из журнала."""
+    for line in iter_lines(source):
+        if line.strip():
+            yield parse_package_line(line)
+
+
+def iter_messages(packages: Iterable[Package]) -> Iterator[InfoMessage]:
+    """Лениво рассчитать сообщения для потока пакетов."""
+    for workout_type, data in packages:
+        yield read_package(workout_type, data).show_training_info()
+
+
+def iter_chunks(items: Iterable, chunk_size: int) -> Iterator[list]:
+    """Разбить поток на порции фиксированного размера."""
+    if chunk_size < 1:
+        raise ValueError('Размер порции должен быть положительным')
+    iterator = iter(items)
+    while chunk := list(islice(iterator, chunk_size)):
+        yield chunk
+
+
+def process_stream(source: Source,
+                   chunk_size: int = 1000
+                   ) -> Iterator[list[InfoMessage]]:
+    """Обработать журнал пакетов порциями с постоянным расходом памяти."""
+    return iter_chunks(iter_messages(iter_packages(source)), chunk_size)
+
+
+def process_package_chunk(chunk: list[Package]) -> list[InfoMessage]:
+    """Рассчитать сообщения для порции пакетов."""
+    return list(iter_messages(chunk))
+
+
+def process_parallel(packages: Iterable[Package],
+                     workers: Optional[int] = None,
+                     chunk_size: int = 1000
+                     ) -> Iterator[InfoMessage]:
+    """Рассчитать сообщения в пуле процессов с сохранением порядка."""
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending: deque[Future] = deque()
+        for chunk in iter_chunks(packages, chunk_size):
+            pending.append(executor.submit(process_package_chunk, chunk))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def answer_package_line(line: bytes) -> str:
+    """Сформировать ответ сервера на строку; любая ошибка пакета — ответ."""
+    try:
+        workout_type, data = parse_package_line(line.decode('utf-8'))
+        training = read_package(workout_type, data)
+        return training.show_training_info().get_message()
+    except Exception as error:
+        return f'Ошибка: {error}'
+
+
+async def put_while_running(queue: asyncio.Queue,
+                            item: object,
+                            consumer: asyncio.Task
+                            ) -> bool:
+    """Положить элемент в очередь, пока её потребитель работает."""
+    if consumer.done():
+        return False
+    try:
+        queue.put_nowait(item)
+        return True
+    except asyncio.QueueFull:
+        pass
+    put = asyncio.ensure_future(queue.put(item))
+    try:
+        await asyncio.wait((put, consumer),
+                           return_when=asyncio.FIRST_COMPLETED)
+        return put.done()
+    finally:
+        put.cancel()
+
+
+async def handle_connection(reader: asyncio.StreamReader,
+                            writer: asyncio.StreamWriter,
+                            queue_size: int = SERVER_QUEUE_SIZE
+                            ) -> None:
+    """Обработать соединение: читать пакеты и отвечать по порядку."""
+    replies: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    async def send_replies() -> None:
+        while (reply := await replies.get()) is not None:
+            writer.write(reply.encode('utf-8') + b'\n')
+            await writer.drain()
+
+    sender = asyncio.create_task(send_replies())
+    try:
+        async for line in reader:
+            if line.strip() and not await put_while_running(
+                replies, answer_package_line(line), sender
+            ):
+                break
+        if await put_while_running(replies, None, sender):
+            await sender
+    except ConnectionError:
+        pass
+    finally:
+        if not sender.done():
+            sender.cancel()
+        elif not sender.cancelled():
+            sender.exception()
+        writer.close()
+        with suppress(ConnectionError):
+            await writer.wait_closed()
+
+
+async def start_server(host: str = SERVER_HOST,
+                       port: int = SERVER_PORT,
+                       path: Optional[str] = None,
+                       queue_size: int = SERVER_QUEUE_SIZE
+                       ) -> asyncio.AbstractServer:
+    """Запустить сервер приёма пакетов на TCP или Unix-сокете."""
+    handler = partial(handle_connection, queue_size=queue_size)
+    if path is not None:
+        return await asyncio.start_unix_server(handler, path=path)
+    return await asyncio.start_server(handler, host, port)
+
+
+async def serve(host: str = SERVER_HOST,
+                port: int = SERVER_PORT,
+                path: Optional[str] = None,
+                queue_size: int = SERVER_QUEUE_SIZE
+                ) -> None:
+    """Обслуживать трекеры до остановки сервера."""
+    server = await start_server(host, port, path, queue_size)
+    async with server:
+        await server.serve_forever()
+
+
+async def send_packages(packages: Iterable[Package],
+                        host: str = SERVER_HOST,
+                        port: int = SERVER_PORT,
+                        path: Optional[str] = None
+                        ) -> list[str]:
+    """Отправить пакеты серверу одним потоком и получить ответы."""
+    if path is not None:
+        reader, writer = await asyncio.open_unix_connection(path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+
+    async def write_packages() -> None:
+        for workout_type, data in packages:
+            writer.write(json.dumps([workout_type, data]).encode() + b'\n')
+            await writer.drain()
+        writer.write_eof()
+
+    sender = asyncio.create_task(write_packages())
+    replies = [line.decode('utf-8').rstrip('\n') async for line in reader]
+    await sender
+    writer.close()
+    await writer.wait_closed()
+    return replies
+
+
+async def load_test(packages: Sequence[Package],
+                    connections: int = 10,
+                    host: str = SERVER_HOST,
+                    port: int = SERVER_PORT,
+                    path: Optional[str] = None
+                    ) -> float:
+    """Нагрузить сервер параллельными соединениями, вернуть пакетов/с."""
+    start = perf_counter()
+    await asyncio.gather(*[send_packages(packages, host, port, path)
+                           for _ in range(connections)])
+    return len(packages) * connections / (perf_counter() - start)
+
+
+def iter_message_rows(messages: Iterable[InfoMessage]) -> Iterator[MessageRow]:
+    """Получить строки значений из информационных сообщений."""
+    for info in messages:
+        yield (info.training_type, info.duration, info.distance,
+               info.speed, info.calories)
+
+
+def iter_batch_rows(batch: BatchInfo) -> Iterator[MessageRow]:
+    """Получить строки значений из результатов пакетного расчёта."""
+    return zip(repeat(batch.training_type), batch.duration,
+               batch.distance, batch.speed, batch.calories)
+
+
+def write_message_rows(rows: Iterable[tuple],
+                       stream: Optional[TextIO] = None,
+                       chunk_size: int = 1000
+                       ) -> int:
+    """Записать сообщения по строкам значений порциями в поток."""
+    if stream is None:
+        stream = sys.stdout
+    count = 0
+    for chunk in iter_chunks(rows, chunk_size):
+        stream.write('\n'.join([render_message(*row) for row in chunk]))
+        stream.write('\n')
+        count += len(chunk)
+    return count
+
+
+def render_messages(messages: Iterable[InfoMessage],
+                    stream: Optional[TextIO] = None,
+                    chunk_size: int = 1000
+                    ) -> int:
+    """Записать информационные сообщения в поток."""
+    return write_message_rows(iter_message_rows(messages), stream, chunk_size)
+
+
+def render_batch(batch: BatchInfo,
+                 stream: Optional[TextIO] = None,
+                 chunk_size: int = 1000
+                 ) -> int:
+    """Записать сообщения для результатов пакетного расчёта."""
+    return write_message_rows(iter_batch_rows(batch), stream, chunk_size)
+
+
+def encode_packages(workout_type: str,
+                    rows: Iterable[Sequence[float]]
+                    ) -> bytes:
+    """Упаковать данные пакетов одного типа в двоичные записи."""
+    training_type = get_training_type(workout_type)
+    packer = struct.Struct(training_type.PACKET_FORMAT)
+    return b''.join([packer.pack(*data) for data in rows])
+
+
+def check_binary_buffer(training_type: type[Training],
+                        buffer: memoryview
+                        ) -> None:
+    """Проверить, что буфер состоит из целых записей."""
+    size = struct.calcsize(training_type.PACKET_FORMAT)
+    if buffer.nbytes % size:
+        raise ValueError(
+            f'Размер буфера {buffer.nbytes} не кратен '
+            f'размеру записи {training_type.__name__}: {size}')
+
+
+def decode_packages(workout_type: str, buffer: bytes) -> list[Training]:
+    """Распаковать двоичные записи одного типа в тренировки."""
+    training_type = get_training_type(workout_type)
+    view = memoryview(buffer)
+    check_binary_buffer(training_type, view)
+    return [training_type(*data)
+            for data in struct.iter_unpack(training_type.PACKET_FORMAT,
+                                           view)]
+
+
+def decode_columns(workout_type: str, buffer: bytes) -> dict[str, array]:
+    """Распаковать двоичные записи одного типа в колонки."""
+    training_type = get_training_type(workout_type)
+    view = memoryview(buffer)
+    check_binary_buffer(training_type, view)
+    values = array('d')
+    values.frombytes(view)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    step = len(training_type.FIELDS)
+    return {field: values[index::step]
+            for index, field in enumerate(training_type.FIELDS)}
+
+
+def encode_log_record(workout_type: str, data: Sequence[float]) -> bytes:
+    """Упаковать пакет в запись журнала: код тренировки и поля."""
+    training_type = get_training_type(workout_type)
+    check_package_length(training_type, data)
+    code = workout_type.encode('ascii')
+    if len(code) != LOG_CODE_SIZE:
+        raise ValueError(
+            f'Код тренировки должен занимать {LOG_CODE_SIZE} байта')
+    return code + struct.pack(training_type.PACKET_FORMAT, *data)
+
+
+def write_package_log(path: Union[str, Path],
+                      packages: Iterable[Package],
+                      chunk_size: int = 1000
+                      ) -> int:
+    """Записать пакеты в двоичный журнал."""
+    count = 0
+    with open(path, 'wb') as log:
+        for chunk in iter_chunks(packages, chunk_size):
+            log.write(b''.join([encode_log_record(workout_type, data)
+                                for workout_type, data in chunk]))
+            count += len(chunk)
+    return count
+
+
+def iter_mapped_packages(mapped: mmap.mmap) -> Iterator[Package]:
+    """Лениво прочитать пакеты из отображённого в память журнала."""
+    packers: dict[bytes, struct.Struct] = {}
+    offset, size = 0, len(mapped)
+    while offset < size:
+        if offset + LOG_CODE_SIZE > size:
+            raise ValueError(f'Журнал обрезан на смещении {offset}')
+        code = mapped[offset:offset + LOG_CODE_SIZE]
+        if code not in packers:
+            training_type = get_training_type(code.decode('ascii'))
+            packers[code] = struct.Struct(training_type.PACKET_FORMAT)
+        packer = packers[code]
+        offset += LOG_CODE_SIZE
+        if offset + packer.size > size:
+            raise ValueError(f'Журнал обрезан на смещении {offset}')
+        yield code.decode('ascii'), list(packer.unpack_from(mapped, offset))
+        offset += packer.size
+
+
+def iter_package_log(path: Union[str, Path]) -> Iterator[Package]:
+    """Лениво прочитать двоичный журнал через отображение в память."""
+    with open(path, 'rb') as log:
+        if not os.fstat(log.fileno()).st_size:
+            return
+        with mmap.mmap(log.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield from iter_mapped_packages(mapped)
+
+
+def iter_log_messages(path: Union[str, Path]) -> Iterator[InfoMessage]:
+    """Лениво рассчитать сообщения по двоичному журналу."""
+    return iter_messages(iter_package_log(path))
+
+
+def summarize_package_log(path: Union[str, Path]) -> dict[str, InfoMessage]:
+    """Подсчитать итоги двоичного журнала по типам тренировок."""
+    aggregator = TrainingAggregator()
+    for info in iter_log_messages(path):
+        aggregator.add(info)
+    return {
+        training_type: info
+        for (_, _, training_type), info in aggregator.summary().items()
+    }
+
+
+def export_csv(path: Union[str, Path],
+               rows: Iterable[MessageRow],
+               chunk_size: int = 1000
+               ) -> int:
+    """Записать колонки результатов в CSV порциями."""
+    count = 0
+    with open(path, 'w', encoding='utf-8', newline='') as export:
+        writer = csv.writer(export)
+        writer.writerow(MESSAGE_FIELDS)
+        for chunk in iter_chunks(rows, chunk_size):
+            writer.writerows(chunk)
+            count += len(chunk)
+    return count
+
+
+def write_npy_header(stream: BinaryIO, descr: str, size: int) -> None:
+    """Записать заголовок .npy для одномерной колонки."""
+    header = (f"{{'descr': '{descr}', 'fortran_order': False, "
+              f"'shape': ({size},), }}")
+    padding = -(len(NPY_MAGIC) + 2 + len(header) + 1) % NPY_ALIGNMENT
+    header = header + ' ' * padding + '\n'
+    stream.write(NPY_MAGIC)
+    stream.write(struct.pack('<H', len(header)))
+    stream.write(header.encode('latin1'))
+
+
+def save_npy(stream: BinaryIO, values: Union[array, list[str]]) -> None:
+    """Записать колонку в формате .npy."""
+    if isinstance(values, array):
+        descr = '<f8'
+        data = array('d', values)
+        if sys.byteorder == 'big':
+            data.byteswap()
+        payload = data.tobytes()
+    else:
+        width = max(map(len, values), default=1) or 1
+        descr = f'<U{width}'
+        payload = ''.join(value.ljust(width, '\0')
+                          for value in values).encode('utf-32-le')
+    write_npy_header(stream, descr, len(values))
+    stream.write(payload)
+
+
+def load_npy(stream: BinaryIO) -> Union[array, list[str]]:
+    """Прочитать колонку, записанную функцией save_npy."""
+    if stream.read(len(NPY_MAGIC)) != NPY_MAGIC:
+        raise ValueError('Неподдерживаемый формат .npy')
+    (header_size,) = struct.unpack('<H', stream.read(2))
+    header = ast.literal_eval(stream.read(header_size).decode('latin1'))
+    payload = stream.read()
+    if header['descr'] == '<f8':
+        values = array('d')
+        values.frombytes(payload)
+        if sys.byteorder == 'big':
+            values.byteswap()
+        return values
+    width = int(header['descr'][2:])
+    text = payload.decode('utf-32-le')
+    return [text[start:start + width].rstrip('\0')
+            for start in range(0, len(text), width)]
+
+
+def copy_npy_labels(stream: BinaryIO,
+                    spool: BinaryIO,
+                    size: int,
+                    names: list[str],
+                    chunk_size: int
+                    ) -> None:
+    """Записать колонку строк .npy по кодам из временного файла."""
+    width = max(map(len, names), default=1) or 1
+    encoded = [name.ljust(width, '\0').encode('utf-32-le')
+               for name in names]
+    write_npy_header(stream, f'<U{width}', size)
+    itemsize = array('q').itemsize
+    while block := spool.read(chunk_size * itemsize):
+        stream.write(b''.join([encoded[code] for code in array('q', block)]))
+
+
+def export_npz(path: Union[str, Path],
+               rows: Iterable[MessageRow],
+               chunk_size: int = 1000
+               ) -> int:
+    """Записать колонки результатов в архив .npz, держа в памяти порцию."""
+    names: dict[str, int] = {}
+    size = 0
+    with ExitStack() as stack:
+        spools = [stack.enter_context(TemporaryFile())
+                  for _ in MESSAGE_FIELDS]
+        for chunk in iter_chunks(rows, chunk_size):
+            training_types, *values = zip(*chunk)
+            codes = array('q', [names.setdefault(name, len(names))
+                                for name in training_types])
+            spools[0].write(codes.tobytes())
+            for spool, chunk_values in zip(spools[1:], values):
+                column = array('d', chunk_values)
+                if sys.byteorder == 'big':
+                    column.byteswap()
+                spool.write(column.tobytes())
+            size += len(chunk)
+        with zipfile.ZipFile(path, 'w') as archive:
+            for field, spool in zip(MESSAGE_FIELDS, spools):
+                spool.seek(0)
+                with archive.open(f'{field}.npy', 'w',
+                                  force_zip64=True) as stream:
+                    if spool is spools[0]:
+                        copy_npy_labels(stream, spool, size, list(names),
+                                        chunk_size)
+                    else:
+                        write_npy_header(stream, '<f8', size)
+                        shutil.copyfileobj(spool, stream)
+    return size
+
+
+def load_npz(path: Union[str, Path]) -> dict[str, Union[array, list[str]]]:
+    """Прочитать колонки результатов из архива .npz."""
+    columns = {}
+    with zipfile.ZipFile(path) as archive:
+        for field in MESSAGE_FIELDS:
+            with archive.open(f'{field}.npy') as stream:
+                columns[field] = load_npy(stream)
+    return columns
+
+
+class Leaderboard:
+    """Потоковые таблицы лидеров по типам тренировок."""
+    METRICS: tuple[str, ...] = ('distance', 'speed', 'calories')
+
+    def __init__(self, size: int = 10) -> None:
+        if size < 1:
+            raise ValueError('Размер таблицы должен быть положительным')
+        self.size: int = size
+        self.boards: dict[tuple[str, str], list] = {}
+        self.order: Iterator[int] = count()
+
+    def push(self, metric: str, value: float, row: MessageRow) -> None:
+        """Предложить результат в таблицу лидеров за O(log K)."""
+        board = self.boards.setdefault((row[0], metric), [])
+        if len(board) < self.size:
+            heappush(board, (value, next(self.order), row))
+        elif value > board[0][0]:
+            heapreplace(board, (value, next(self.order), row))
+
+    def add_row(self, row: MessageRow) -> None:
+        """Учесть строку значений результата."""
+        for metric in self.METRICS:
+            self.push(metric, row[MESSAGE_FIELDS.index(metric)], row)
+
+    def add(self, info: InfoMessage) -> None:
+        """Учесть сообщение о тренировке."""
+        for row in iter_message_rows([info]):
+            self.add_row(row)
+
+    def add_batch(self, batch: BatchInfo) -> None:
+        """Учесть результаты пакетного расчёта."""
+        for row in iter_batch_rows(batch):
+            self.add_row(row)
+
+    def merge(self, other: 'Leaderboard') -> 'Leaderboard':
+        """Объединить с таблицами лидеров другого обработчика."""
+        for (_, metric), board in other.boards.items():
+            for value, _, row in board:
+                self.push(metric, value, row)
+        return self
+
+    def top(self, training_type: str, metric: str) -> list[InfoMessage]:
+        """Получить лидеров по убыванию показателя."""
+        if metric not in self.METRICS:
+            raise KeyError(f'Нет таблицы лидеров по показателю {metric}')
+        board = self.boards.get((training_type, metric), [])
+        return [InfoMessage(*row) for _, _, row in sorted(board, reverse=True)]
+
+
+class LogHistogram:
+    """Логарифмическая гистограмма для приближённых квантилей."""
+
+    def __init__(self, relative_accuracy: float = 0.01) -> None:
+        if not 0 < relative_accuracy < 1:
+            raise ValueError('Точность должна быть в интервале (0, 1)')
+        self.relative_accuracy: float = relative_accuracy
+        self.gamma: float = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma: float = math.log(self.gamma)
+        self.positive: dict[int, int] = {}
+        self.negative: dict[int, int] = {}
+        self.zero_count: int = 0
+        self.count: int = 0
+
+    def get_bucket(self, value: float) -> int:
+        """Получить номер корзины для модуля значения."""
+        return math.ceil(math.log(value) / self.log_gamma)
+
+    def get_bucket_value(self, index: int) -> float:
+        """Получить представителя корзины с ограниченной ошибкой."""
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def add(self, value: float) -> None:
+        """Учесть значение."""
+        self.count += 1
+        if value > 0:
+            index = self.get_bucket(value)
+            self.positive[index] = self.positive.get(index, 0) + 1
+        elif value < 0:
+            index = self.get_bucket(-value)
+            self.negative[index] = self.negative.get(index, 0) + 1
+        else:
+            self.zero_count += 1
+
+    def iter_buckets(self) -> Iterator[tuple[float, int]]:
+        """Перебрать корзины по возрастанию значений."""
+        for index in sorted(self.negative, reverse=True):
+            yield -self.get_bucket_value(index), self.negative[index]
+        if self.zero_count:
+            yield 0.0, self.zero_count
+        for index in sorted(self.positive):
+            yield self.get_bucket_value(index), self.positive[index]
+
+    def quantile(self, q: float) -> float:
+        """Получить приближённый квантиль уровня q."""
+        if not self.count:
+            raise ValueError('Гистограмма пуста')
+        if not 0 <= q <= 1:
+            raise ValueError('Уровень квантиля должен быть в [0, 1]')
+        rank = q * (self.count - 1)
+        seen = 0
+        for value, bucket_count in self.iter_buckets():
+            seen += bucket_count
+            if seen > rank:
+                return value
+        return value
+
+    def merge(self, other: 'LogHistogram') -> 'LogHistogram':
+        """Объединить с гистограммой той же точности."""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError('Нельзя объединить гистограммы разной точности')
+        for index, bucket_count in other.positive.items():
+            self.positive[index] = self.positive.get(index, 0) + bucket_count
+        for index, bucket_count in other.negative.items():
+            self.negative[index] = self.negative.get(index, 0) + bucket_count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        return self
+
+    def to_dict(self) -> dict:
+        """Сериализовать гистограмму."""
+        return {'relative_accuracy': self.relative_accuracy,
+                'positive': self.positive,
+                'negative': self.negative,
+                'zero_count': self.zero_count}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'LogHistogram':
+        """Восстановить гистограмму после сериализации."""
+        histogram = cls(data['relative_accuracy'])
+        histogram.positive = {int(index): bucket_count for index, bucket_count
+                              in data['positive'].items()}
+        histogram.negative = {int(index): bucket_count for index, bucket_count
+                              in data['negative'].items()}
+        histogram.zero_count = data['zero_count']
+        histogram.count = (sum(histogram.positive.values())
+                           + sum(histogram.negative.values())
+                           + histogram.zero_count)
+        return histogram
+
+
+class TrainingSketches:
+    """Квантили скорости и калорий по типам тренировок."""
+    METRICS: tuple[str, ...] = ('speed', 'calories')
+
+    def __init__(self, relative_accuracy: float = 0.01) -> None:
+        self.relative_accuracy: float = relative_accuracy
+        self.sketches: dict[tuple[str, str], LogHistogram] = {}
+
+    def get_sketch(self, training_type: str, metric: str) -> LogHistogram:
+        """Получить гистограмму, создав её при необходимости."""
+        key = (training_type, metric)
+        if key not in self.sketches:
+            self.sketches[key] = LogHistogram(self.relative_accuracy)
+        return self.sketches[key]
+
+    def add_row(self, row: MessageRow) -> None:
+        """Учесть строку значений результата."""
+        for metric in self.METRICS:
+            self.get_sketch(row[0], metric).add(
+                row[MESSAGE_FIELDS.index(metric)])
+
+    def add(self, info: InfoMessage) -> None:
+        """Учесть сообщение о тренировке."""
+        for row in iter_message_rows([info]):
+            self.add_row(row)
+
+    def add_batch(self, batch: BatchInfo) -> None:
+        """Учесть результаты пакетного расчёта."""
+        for row in iter_batch_rows(batch):
+            self.add_row(row)
+
+    def merge(self, other: 'TrainingSketches') -> 'TrainingSketches':
+        """Объединить с гистограммами другого процесса или дня."""
+        for (training_type, metric), sketch in other.sketches.items():
+            self.get_sketch(training_type, metric).merge(sketch)
+        return self
+
+    def quantiles(self,
+                  training_type: str,
+                  metric: str,
+                  levels: Sequence[float] = (0.5, 0.95, 0.99)
+                  ) -> dict[float, float]:
+        """Получить квантили показателя для типа тренировки."""
+        sketch = self.sketches[(training_type, metric)]
+        return {level: sketch.quantile(level) for level in levels}
+
+    def to_json(self) -> str:
+        """Сериализовать гистограммы в JSON."""
+        return json.dumps({
+            'relative_accuracy': self.relative_accuracy,
+            'sketches': [[training_type, metric, sketch.to_dict()]
+                         for (training_type, metric), sketch
+                         in self.sketches.items()],
+        })
+
+    @classmethod
+    def from_json(cls, payload: str) -> 'TrainingSketches':
+        """Восстановить гистограммы из JSON."""
+        data = json.loads(payload)
+        sketches = cls(data['relative_accuracy'])
+        for training_type, metric, sketch in data['sketches']:
+            sketches.sketches[(training_type, metric)] = (
+                LogHistogram.from_dict(sketch))
+        return sketches
+
+
+class SharedTrainingRing:
+    """Кольцевой буфер записей тренировок в разделяемой памяти."""
+    HEADER = struct.Struct('<qqqq')
+    EMPTY: int = 0
+    WRITTEN: int = 1
+    COMPUTED: int = 2
+    created: set[str] = set()
+
+    def __init__(self,
+                 name: Optional[str] = None,
+                 capacity: int = 1024
+                 ) -> None:
+        if name is not None:
+            self.memory = SharedMemory(name=name)
+            if self.memory.name not in self.created:
+                resource_tracker.unregister(self.memory._name,
+                                            'shared_memory')
+            self.capacity, self.field_count, _, _ = self.HEADER.unpack_from(
+                self.memory.buf)
+        else:
+            self.capacity = capacity
+            self.field_count = max(
+                len(training_type.FIELDS)
+                for training_type in TYPE_TRAINING.values())
+        self.record = struct.Struct(
+            f'<{LOG_CODE_SIZE}sB{self.field_count}d3d')
+        if name is None:
+            self.memory = SharedMemory(
+                create=True,
+                size=self.HEADER.size + self.record.size * capacity)
+            self.created.add(self.memory.name)
+            self.HEADER.pack_into(self.memory.buf, 0,
+                                  capacity, self.field_count, 0, 0)
+
+    @property
+    def name(self) -> str:
+        return self.memory.name
+
+    def get_positions(self) -> tuple[int, int]:
+        """Получить счётчики записанных и прочитанных ячеек."""
+        _, _, head, tail = self.HEADER.unpack_from(self.memory.buf)
+        return head, tail
+
+    def set_positions(self, head: int, tail: int) -> None:
+        """Сохранить счётчики записанных и прочитанных ячеек."""
+        self.HEADER.pack_into(self.memory.buf, 0,
+                              self.capacity, self.field_count, head, tail)
+
+    def get_offset(self, slot: int) -> int:
+        """Получить смещение ячейки в разделяемой памяти."""
+        return self.HEADER.size + self.record.size * slot
+
+    def put(self, workout_type: str, data: Sequence[float]) -> int:
+        """Записать пакет в свободную ячейку и вернуть её номер."""
+        check_package_length(get_training_type(workout_type), data)
+        quarantine = validate_packages([(workout_type, data)]).quarantine
+        if quarantine:
+            raise ValueError(f'Пакет {workout_type} отклонён: '
+                             f'{quarantine[0].reason}')
+        head, tail = self.get_positions()
+        if head - tail >= self.capacity:
+            raise BufferError('Кольцевой буфер заполнен')
+        slot = head % self.capacity
+        fields = [*data, *[0.0] * (self.field_count - len(data))]
+        self.record.pack_into(self.memory.buf, self.get_offset(slot),
+                              workout_type.encode('ascii'), self.WRITTEN,
+                              *fields, 0.0, 0.0, 0.0)
+        self.set_positions(head + 1, tail)
+        return slot
+
+    def compute(self, slot: int) -> None:
+        """Рассчитать показатели ячейки на месте."""
+        offset = self.get_offset(slot)
+        code, _, *values = self.record.unpack_from(self.memory.buf, offset)
+        training_type = get_training_type(code.decode('ascii'))
+        training = training_type(*values[:len(training_type.FIELDS)])
+        self.record.pack_into(
+            self.memory.buf, offset, code, self.COMPUTED,
+            *values[:self.field_count],
+            training.get_distance(),
+            training.get_mean_speed(),
+            training.get_spent_calories())
+
+    def compute_pending(self) -> int:
+        """Рассчитать все записанные, но не рассчитанные ячейки."""
+        head, tail = self.get_positions()
+        computed = 0
+        for position in range(tail, head):
+            slot = position % self.capacity
+            state = self.memory.buf[self.get_offset(slot) + LOG_CODE_SIZE]
+            if state == self.WRITTEN:
+                self.compute(slot)
+                computed += 1
+        return computed
+
+    def pop(self) -> InfoMessage:
+        """Забрать самый старый рассчитанный результат."""
+        head, tail = self.get_positions()
+        if head == tail:
+            raise BufferError('Кольцевой буфер пуст')
+        offset = self.get_offset(tail % self.capacity)
+        code, state, *values = self.record.unpack_from(self.memory.buf,
+                                                       offset)
+        if state != self.COMPUTED:
+            raise BufferError('Ячейка ещё не рассчитана')
+        training_type = get_training_type(code.decode('ascii'))
+        self.memory.buf[offset + LOG_CODE_SIZE] = self.EMPTY
+        self.set_positions(head, tail + 1)
+        return InfoMessage(training_type.__name__, values[1],
+                           *values[self.field_count:])
+
+    def close(self) -> None:
+        """Отключиться от разделяемой памяти."""
+        self.memory.close()
+
+    def unlink(self) -> None:
+        """Освободить разделяемую память."""
+        self.memory.unlink()
+        self.created.discard(self.memory.name)
+
+
+@dataclass
+class StoredTraining:
+    """Сохранённый результат тренировки с пользователем и временем."""
+    user: Hashable
+    timestamp: float
+    info: InfoMessage
+
+
+class ResultStore:
+    """Хранилище результатов с индексами по пользователю и времени."""
+
+    def __init__(self) -> None:
+        self.users: list[Hashable] = []
+        self.timestamps: array = array('d')
+        self.training_types: list[str] = []
+        self.columns: dict[str, array] = {
+            field: array('d') for field in MESSAGE_FIELDS[1:]
+        }
+        self.indexes: dict[tuple[Hashable, str], tuple[array, array]] = {}
+        self.user_types: dict[Hashable, list[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def append_row(self,
+                   row: MessageRow,
+                   user: Hashable,
+                   timestamp: float
+                   ) -> int:
+        """Добавить строку значений результата и вернуть её номер."""
+        position = len(self.timestamps)
+        self.users.append(user)
+        self.timestamps.append(timestamp)
+        self.training_types.append(row[0])
+        for column, value in zip(self.columns.values(), row[1:]):
+            column.append(value)
+        self.index(user, row[0], timestamp, position)
+        return position
+
+    def index(self,
+              user: Hashable,
+              training_type: str,
+              timestamp: float,
+              position: int
+              ) -> None:
+        """Добавить результат в отсортированный индекс пользователя."""
+        key = (user, training_type)
+        if key not in self.indexes:
+            self.indexes[key] = (array('d'), array('q'))
+            self.user_types.setdefault(user, []).append(training_type)
+        times, positions = self.indexes[key]
+        if not times or timestamp >= times[-1]:
+            times.append(timestamp)
+            positions.append(position)
+            return
+        place = bisect_right(times, timestamp)
+        times.insert(place, timestamp)
+        positions.insert(place, position)
+
+    def append(self,
+               info: InfoMessage,
+               user: Hashable,
+               timestamp: float
+               ) -> int:
+        """Добавить сообщение о тренировке."""
+        row = next(iter_message_rows([info]))
+        return self.append_row(row, user, timestamp)
+
+    def add_batch(self,
+                  batch: BatchInfo,
+                  users: Iterable[Hashable],
+                  timestamps: Iterable[float]
+                  ) -> None:
+        """Добавить результаты пакетного расчёта."""
+        for row, user, timestamp in zip(iter_batch_rows(batch),
+                                        users, timestamps):
+            self.append_row(row, user, timestamp)
+
+    def get(self, position: int) -> StoredTraining:
+        """Получить сохранённый результат по номеру."""
+        info = InfoMessage(self.training_types[position],
+                           *[column[position]
+                             for column in self.columns.values()])
+        return StoredTraining(self.users[position],
+                              self.timestamps[position], info)
+
+    def query(self,
+              user: Hashable,
+              training_type: Optional[str] = None,
+              start: float = -math.inf,
+              end: float = math.inf
+              ) -> list[StoredTraining]:
+        """Найти результаты пользователя в интервале [start, end)."""
+        if training_type is None:
+            training_types = self.user_types.get(user, [])
+        else:
+            training_types = [training_type]
+        found: list[tuple[float, int]] = []
+        for current_type in training_types:
+            times, positions = self.indexes.get((user, current_type),
+                                                (array('d'), array('q')))
+            low = bisect_left(times, start)
+            high = bisect_left(times, end)
+            found.extend(zip(times[low:high], positions[low:high]))
+        if len(training_types) > 1:
+            found.sort()
+        return [self.get(position) for _, position in found]
+
+
+class BloomFilter:
+    """Фильтр Блума для отпечатков пакетов."""
+
+    def __init__(self, capacity: int, error_rate: float) -> None:
+        if capacity < 1 or not 0 < error_rate < 1:
+            raise ValueError('Нужны положительная ёмкость и доля ошибок < 1')
+        self.size: int = max(8, math.ceil(
+            -capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count: int = max(
+            1, round(self.size / capacity * math.log(2)))
+        self.bits: bytearray = bytearray((self.size + 7) // 8)
+        self.count: int = 0
+
+    def get_positions(self, fingerprint: int) -> range:
+        """Получить ряд номеров битов до остатка двойным хешированием."""
+        first = fingerprint & 0xFFFFFFFF
+        second = fingerprint >> 32 & 0xFFFFFFFF | 1
+        return range(first, first + second * self.hash_count, second)
+
+    def __contains__(self, fingerprint: int) -> bool:
+        bits, size = self.bits, self.size
+        for position in self.get_positions(fingerprint):
+            position %= size
+            if not bits[position >> 3] & 1 << (position & 7):
+                return False
+        return True
+
+    def __len__(self) -> int:
+        return self.count
+
+    def add(self, fingerprint: int) -> None:
+        """Добавить отпечаток в фильтр."""
+        bits, size = self.bits, self.size
+        for position in self.get_positions(fingerprint):
+            position %= size
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+
+class PacketDeduplicator:
+    """Отсев повторно присланных пакетов во вращающемся окне."""
+
+    def __init__(self,
+                 capacity: int = 1_000_000,
+                 error_rate: float = 0.001,
+                 window: Optional[float] = None,
+                 clock: Callable[[], float] = monotonic,
+                 exact: bool = True
+                 ) -> None:
+        self.capacity: int = capacity
+        self.error_rate: float = error_rate
+        self.window: Optional[float] = window
+        self.clock: Callable[[], float] = clock
+        self.exact: bool = exact
+        self.current: Union[set[int], BloomFilter] = self.make_filter()
+        self.previous: Union[set[int], BloomFilter] = self.make_filter()
+        self.started: float = clock()
+        self.deadline: float = self.get_deadline()
+        self.duplicates: int = 0
+
+    def make_filter(self) -> Union[set[int], BloomFilter]:
+        """Создать поколение: точное множество или фильтр Блума."""
+        if self.exact:
+            return set()
+        return BloomFilter(self.capacity, self.error_rate / 2)
+
+    @staticmethod
+    def make_fingerprint(device: Hashable,
+                         workout_type: str,
+                         data: Sequence[float]
+                         ) -> int:
+        """Получить 64-битный отпечаток пакета устройства в этом процессе."""
+        return hash((device, workout_type, tuple(data)))
+
+    def rotate(self) -> None:
+        """Сменить поколение, а после простоя в два окна забыть оба."""
+        now = self.clock()
+        if self.window is None:
+            elapsed = 0.0
+        else:
+            elapsed = (now - self.started) / self.window
+        if elapsed >= 2:
+            self.previous = self.make_filter()
+        elif elapsed >= 1 or len(self.current) >= self.capacity:
+            self.previous = self.current
+        else:
+            return
+        self.current = self.make_filter()
+        self.started = now
+        self.deadline = self.get_deadline()
+
+    def get_deadline(self) -> float:
+        """Получить момент, когда текущее поколение нужно сменить."""
+        if self.window is None:
+            return math.inf
+        return self.started + self.window
+
+    def is_duplicate(self,
+                     device: Hashable,
+                     workout_type: str,
+                     data: Sequence[float]
+                     ) -> bool:
+        """Проверить пакет и запомнить его, если он новый."""
+        if (self.clock() >= self.deadline
+                or len(self.current) >= self.capacity):
+            self.rotate()
+        fingerprint = self.make_fingerprint(device, workout_type, data)
+        if fingerprint in self.current or fingerprint in self.previous:
+            self.duplicates += 1
+            return True
+        self.current.add(fingerprint)
+        return False
+
+    def filter(self,
+               packages: Iterable[DevicePackage]
+               ) -> Iterator[DevicePackage]:
+        """Пропустить дальше только новые пакеты."""
+        for device, workout_type, data in packages:
+            if not self.is_duplicate(device, workout_type, data):
+                yield device, workout_type, data
 
 
 def main(training: Training) -> None:
@@ -153,7 +2083,20 @@ def main(training: Training) -> None:
     print(info.get_message())
 
 
+def main_bulk(trainings: Iterable[Training],
+              stream: Optional[TextIO] = None
+              ) -> int:
+    """Вывести сообщения для множества тренировок без print."""
+    return render_messages(
+        (training.show_training_info() for training in trainings), stream
+    )
+
+
 if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        render_messages(iter_messages(iter_packages(sys.argv[1])))
+        sys.exit()
+
     packages = [
         ('SWM', [720, 1, 80, 25, 40]),
         ('RUN', [15000, 1, 75]),
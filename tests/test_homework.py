@@ -1,7 +1,18 @@
+import asyncio
+import csv
+import io
+import json
 import re
+import socket
+import struct
+import subprocess
+import sys
+import tracemalloc
 import pytest
 import types
+import zipfile
 import inspect
+from pathlib import Path
 from conftest import Capturing
 
 try:
@@ -363,3 +374,950 @@ def test_main_output(input_data, expected):
     assert get_message_output == expected, (
         'Метод `main` должен печатать результат в консоль.\n'
     )
+
+
+@pytest.mark.parametrize('workout_type, columns, rows', [
+    ('SWM',
+     {'action': [720, 420, 1206], 'duration': [1, 4, 12],
+      'weight': [80, 20, 6], 'length_pool': [25, 42, 12],
+      'count_pool': [40, 4, 6]},
+     [[720, 1, 80, 25, 40], [420, 4, 20, 42, 4], [1206, 12, 6, 12, 6]]),
+    ('RUN',
+     {'action': [9000, 420, 1206], 'duration': [1, 4, 12],
+      'weight': [75, 20, 6]},
+     [[9000, 1, 75], [420, 4, 20], [1206, 12, 6]]),
+    ('WLK',
+     {'action': [9000, 420, 1206], 'duration': [1, 4, 12],
+      'weight': [75, 20, 6], 'height': [180, 42, 12]},
+     [[9000, 1, 75, 180], [420, 4, 20, 42], [1206, 12, 6, 12]]),
+])
+def test_compute_batch(workout_type, columns, rows):
+    result = homework.compute_batch(workout_type, columns)
+    for index, data in enumerate(rows):
+        info = homework.read_package(workout_type, data).show_training_info()
+        assert result.training_type == info.training_type
+        assert result.distance[index] == info.distance, (
+            'Пакетный расчёт дистанции должен совпадать с поштучным.'
+        )
+        assert result.speed[index] == info.speed, (
+            'Пакетный расчёт скорости должен совпадать с поштучным.'
+        )
+        assert result.calories[index] == info.calories, (
+            'Пакетный расчёт калорий должен совпадать с поштучным.'
+        )
+
+
+def test_compute_batch_unknown_type():
+    with pytest.raises(KeyError):
+        homework.compute_batch('XXX', {})
+
+
+@pytest.mark.parametrize('line, expected', [
+    ('SWM,720,1,80,25,40', ('SWM', [720, 1, 80, 25, 40])),
+    ('RUN, 15000, 1.5, 75\n', ('RUN', [15000, 1.5, 75])),
+    ('["WLK", [9000, 1, 75, 180]]', ('WLK', [9000, 1, 75, 180])),
+    ('{"workout_type": "RUN", "data": [15000, 1, 75]}',
+     ('RUN', [15000, 1, 75])),
+])
+def test_parse_package_line(line, expected):
+    assert homework.parse_package_line(line) == expected, (
+        'Функция `parse_package_line` должна разбирать строки '
+        'в форматах CSV и JSONL.'
+    )
+
+
+def test_process_stream(tmp_path):
+    log = tmp_path / 'packages.log'
+    log.write_text(
+        'SWM,720,1,80,25,40\n'
+        '\n'
+        '["RUN", [1206, 12, 6]]\n'
+        'WLK,9000,1,75,180\n',
+        encoding='utf-8'
+    )
+    chunks = homework.process_stream(log, chunk_size=2)
+    assert hasattr(chunks, '__next__'), (
+        'Функция `process_stream` должна возвращать ленивый итератор.'
+    )
+    chunks = list(chunks)
+    assert [len(chunk) for chunk in chunks] == [2, 1]
+    assert [info.training_type for chunk in chunks for info in chunk] == [
+        'Swimming', 'Running', 'SportsWalking'
+    ]
+    assert chunks[0][1].get_message() == (
+        'Тип тренировки: Running; '
+        'Длительность: 12.000 ч.; '
+        'Дистанция: 0.784 км; '
+        'Ср. скорость: 0.065 км/ч; '
+        'Потрачено ккал: -81.320.'
+    )
+
+
+@pytest.mark.parametrize('input_data', [
+    ('SWM', [720, 1, 80, 25, 40]),
+    ('RUN', [1206, 12, 6]),
+    ('WLK', [9000, 1, 75, 180]),
+])
+def test_TrainingStore(input_data):
+    training = homework.read_package(*input_data)
+    store = homework.TrainingStore()
+    row = store.add_package(*input_data)
+    store.add_training(training)
+    assert len(store) == 2
+    assert not hasattr(row, '__dict__'), (
+        'Строки хранилища не должны хранить словарь атрибутов.'
+    )
+    expected = training.show_training_info()
+    for stored in store:
+        assert stored.get_spent_calories() == training.get_spent_calories()
+        assert stored.show_training_info() == expected, (
+            'Строка хранилища должна давать то же сообщение, '
+            'что и объект тренировки.'
+        )
+    batch = store.get_table(type(training)).compute()
+    assert list(batch.calories) == [expected.calories] * 2
+
+
+def test_TrainingStore_wrong_arity():
+    store = homework.TrainingStore()
+    with pytest.raises(ValueError):
+        store.add_package('RUN', [15000, 1])
+
+
+def test_render_messages():
+    packages = [
+        ('SWM', [720, 1, 80, 25, 40]),
+        ('RUN', [1206, 12, 6]),
+        ('WLK', [9000, 1, 75, 180]),
+    ]
+    messages = [
+        homework.read_package(*package).show_training_info()
+        for package in packages
+    ]
+    stream = io.StringIO()
+    count = homework.render_messages(messages, stream, chunk_size=2)
+    assert count == 3
+    assert stream.getvalue().splitlines() == [
+        info.get_message() for info in messages
+    ], (
+        'Функция `render_messages` должна выводить те же сообщения, '
+        'что и метод `get_message`.'
+    )
+    with Capturing() as bulk_output:
+        homework.main_bulk(
+            homework.read_package(*package) for package in packages
+        )
+    assert bulk_output == stream.getvalue().splitlines()
+
+
+def test_render_batch():
+    columns = {'action': [9000, 15000], 'duration': [1, 1],
+               'weight': [75, 75]}
+    stream = io.StringIO()
+    homework.render_batch(homework.compute_batch('RUN', columns), stream)
+    assert stream.getvalue().splitlines() == [
+        homework.read_package('RUN', [action, 1, 75])
+        .show_training_info().get_message()
+        for action in columns['action']
+    ]
+
+
+def test_training_registry(monkeypatch):
+    monkeypatch.setattr(
+        homework, 'TYPE_TRAINING', dict(homework.TYPE_TRAINING)
+    )
+    assert homework.TYPE_TRAINING['SWM'] is homework.Swimming
+    assert homework.Swimming.FIELDS == (
+        'action', 'duration', 'weight', 'length_pool', 'count_pool'
+    )
+
+    class Rowing(homework.Training, code='ROW'):
+        def get_spent_calories(self) -> float:
+            return self.weight_kg * self.duration_h
+
+    result = homework.read_package('ROW', [1000, 2, 70])
+    assert isinstance(result, Rowing), (
+        'Подклассы `Training` должны регистрироваться по коду тренировки.'
+    )
+    assert result.show_training_info().calories == 140
+    with pytest.raises(ValueError):
+        class Duplicate(homework.Training, code='ROW'):
+            pass
+
+
+@pytest.mark.parametrize('input_data', [
+    ('RUN', [15000, 1]),
+    ('SWM', [720, 1, 80, 25]),
+    ('WLK', [9000, 1, 75, 180, 1]),
+])
+def test_read_package_wrong_length(input_data):
+    with pytest.raises(ValueError):
+        homework.read_package(*input_data)
+
+
+def test_read_packages_grouped():
+    packages = [
+        ('SWM', [720, 1, 80, 25, 40]),
+        ('RUN', [15000, 1, 75]),
+        ('RUN', [1206, 12, 6]),
+        ('WLK', [9000, 1, 75, 180]),
+    ]
+    trainings = homework.read_packages(packages)
+    assert {code: len(items) for code, items in trainings.items()} == {
+        'SWM': 1, 'RUN': 2, 'WLK': 1
+    }
+    results = homework.compute_packages(packages)
+    for code, items in trainings.items():
+        assert list(results[code].calories) == [
+            training.get_spent_calories() for training in items
+        ]
+
+
+@pytest.mark.parametrize('workout_type, rows', [
+    ('SWM', [[720, 1, 80, 25, 40], [420, 4, 20, 42, 4]]),
+    ('RUN', [[15000, 1, 75], [1206, 12, 6]]),
+    ('WLK', [[9000, 1, 75, 180], [420, 4, 20, 42]]),
+])
+def test_binary_packages(workout_type, rows):
+    buffer = homework.encode_packages(workout_type, rows)
+    training_type = homework.TYPE_TRAINING[workout_type]
+    assert len(buffer) == len(rows) * 8 * len(training_type.FIELDS)
+    trainings = homework.decode_packages(workout_type, buffer)
+    assert [training.show_training_info() for training in trainings] == [
+        homework.read_package(workout_type, data).show_training_info()
+        for data in rows
+    ], 'Двоичные записи должны распаковываться без потери данных.'
+    columns = homework.decode_columns(workout_type, buffer)
+    batch = homework.compute_batch(workout_type, columns)
+    assert list(batch.calories) == [
+        training.get_spent_calories() for training in trainings
+    ]
+    with pytest.raises(ValueError):
+        homework.decode_columns(workout_type, buffer[:-1])
+
+
+def test_package_log(tmp_path):
+    packages = [
+        ('SWM', [720, 1, 80, 25, 40]),
+        ('RUN', [15000, 1, 75]),
+        ('WLK', [9000, 1, 75, 180]),
+        ('RUN', [1206, 12, 6]),
+    ]
+    log = tmp_path / 'packages.bin'
+    assert homework.write_package_log(log, packages, chunk_size=3) == 4
+    assert list(homework.iter_package_log(log)) == packages, (
+        'Двоичный журнал должен читаться в исходные пакеты.'
+    )
+    messages = list(homework.iter_log_messages(log))
+    assert messages[1] == homework.read_package(
+        *packages[1]).show_training_info()
+    summary = homework.summarize_package_log(log)
+    assert summary['Running'].duration == 13
+    assert summary['Running'].calories == (
+        messages[1].calories + messages[3].calories
+    )
+    empty = tmp_path / 'empty.bin'
+    empty.write_bytes(b'')
+    assert list(homework.iter_package_log(empty)) == []
+
+
+def test_package_log_truncated(tmp_path):
+    log = tmp_path / 'packages.bin'
+    homework.write_package_log(log, [('RUN', [15000, 1, 75])])
+    log.write_bytes(log.read_bytes()[:-1])
+    with pytest.raises(ValueError):
+        list(homework.iter_package_log(log))
+    homework.write_package_log(log, [('RUN', [15000, 1, 75])] * 2)
+    content = log.read_bytes()
+    for cut in (1, 2):
+        log.write_bytes(content[:len(content) // 2 + cut])
+        with pytest.raises(ValueError, match='обрезан'):
+            list(homework.iter_package_log(log))
+
+
+def test_process_parallel():
+    packages = [
+        ('SWM', [720, 1, 80, 25, 40]),
+        ('RUN', [15000, 1, 75]),
+        ('WLK', [9000, 1, 75, 180]),
+    ] * 7
+    messages = homework.process_parallel(
+        iter(packages), workers=2, chunk_size=4
+    )
+    assert list(messages) == list(homework.iter_messages(packages)), (
+        'Функция `process_parallel` должна возвращать сообщения '
+        'в порядке входных пакетов.'
+    )
+
+
+def test_package_server(tmp_path):
+    packages = [
+        ('SWM', [720, 1, 80, 25, 40]),
+        ('XXX', [1, 2, 3]),
+        ('RUN', [1206, 12, 6]),
+    ] * 50
+
+    async def exchange():
+        server = await homework.start_server(port=0, queue_size=4)
+        port = server.sockets[0].getsockname()[1]
+        unix_path = str(tmp_path / 'tracker.sock')
+        unix_server = await homework.start_server(path=unix_path)
+        async with server, unix_server:
+            tcp_replies = await homework.send_packages(packages, port=port)
+            unix_replies = await homework.send_packages(
+                packages, path=unix_path
+            )
+            rate = await homework.load_test(
+                packages, connections=3, port=port
+            )
+        return tcp_replies, unix_replies, rate
+
+    tcp_replies, unix_replies, rate = asyncio.run(exchange())
+    assert len(tcp_replies) == len(packages)
+    assert tcp_replies == unix_replies
+    assert tcp_replies[0] == homework.read_package(
+        *packages[0]).show_training_info().get_message(), (
+        'Сервер должен отвечать сообщением о тренировке.'
+    )
+    assert tcp_replies[1].startswith('Ошибка'), (
+        'На неизвестный тип тренировки сервер должен отвечать ошибкой.'
+    )
+    assert rate > 0
+
+
+def test_package_server_bad_line():
+    good = json.dumps(['RUN', [1206, 12, 6]]).encode() + b'\n'
+    lines = [good, b'RUN,' + b'9' * 400 + b',1,75\n', good,
+             '\u00a0\n'.encode(), good, b'[' * 5000 + b'\n', good]
+
+    async def exchange():
+        server = await homework.start_server(port=0, queue_size=2)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(b''.join(lines))
+            writer.write_eof()
+            replies = [line.decode().rstrip('\n') async for line in reader]
+            writer.close()
+            await writer.wait_closed()
+        return replies
+
+    replies = asyncio.run(exchange())
+    expected = homework.read_package(
+        'RUN', [1206, 12, 6]).show_training_info().get_message()
+    assert replies[::2] == [expected] * 4, (
+        'Ошибка в одном пакете не должна обрывать соединение.'
+    )
+    assert all(reply.startswith('Ошибка') for reply in replies[1::2])
+    assert len(replies) == len(lines)
+
+
+def test_package_server_client_reset():
+    line = json.dumps(['RUN', [1206, 12, 6]]).encode() + b'\n'
+
+    async def exchange():
+        finished = asyncio.Event()
+
+        async def handler(reader, writer):
+            sock = writer.get_extra_info('socket')
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+            writer.transport.set_write_buffer_limits(high=0)
+            try:
+                await homework.handle_connection(reader, writer, queue_size=2)
+            finally:
+                finished.set()
+
+        server = await asyncio.start_server(handler, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            sock = writer.get_extra_info('socket')
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+            writer.write(line * 20_000)
+            await asyncio.sleep(0.3)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER,
+                            struct.pack('ii', 1, 0))
+            writer.transport.abort()
+            await asyncio.wait_for(finished.wait(), timeout=5)
+
+    asyncio.run(exchange())
+
+
+@pytest.mark.parametrize('input_data, deltas, expected', [
+    (('SWM', [0, 0.5, 80, 25, 0]),
+     [{'action': 360, 'duration': 0.25, 'count_pool': 20},
+      {'action': 360, 'duration': 0.25, 'count_pool': 20}],
+     ('SWM', [720, 1, 80, 25, 40])),
+    (('RUN', [5000, 0.5, 75]),
+     [{'action': 5000, 'duration': 0.25}, {'action': 5000}],
+     ('RUN', [15000, 0.75, 75])),
+    (('WLK', [3000, 0.5, 75, 180]),
+     [{'action': 6000}, {'duration': 0.5}],
+     ('WLK', [9000, 1, 75, 180])),
+])
+def test_LiveTraining(input_data, deltas, expected):
+    session = homework.LiveTraining.start(*input_data)
+    for delta in deltas:
+        session.update(**delta)
+    assert session.snapshot() == homework.read_package(
+        *expected).show_training_info(), (
+        'Сообщение живой тренировки должно совпадать с итоговым пакетом.'
+    )
+
+
+def test_LiveTraining_wrong_field():
+    session = homework.LiveTraining.start('RUN', [5000, 0.5, 75])
+    with pytest.raises(ValueError):
+        session.update(count_pool=1)
+    with pytest.raises(ValueError):
+        session.update(weight=1)
+    with pytest.raises(ValueError):
+        session.update(action=1000, duration=0.5, count_pool=1)
+    with pytest.raises(TypeError):
+        session.update(action=1000, duration='0.5')
+    assert session.snapshot() == homework.read_package(
+        'RUN', [5000, 0.5, 75]).show_training_info(), (
+        'Отклонённое обновление не должно менять тренировку.'
+    )
+    assert session.updates == 0
+
+
+def test_show_training_info_single_pass():
+    class CountingRunning(homework.Running):
+        calls = 0
+
+        def get_distance(self) -> float:
+            CountingRunning.calls += 1
+            return super().get_distance()
+
+    training = CountingRunning(9000, 1, 75)
+    info = training.show_training_info()
+    assert CountingRunning.calls == 1, (
+        'Дистанция должна вычисляться один раз на сообщение.'
+    )
+    assert info.calories == homework.Running(9000, 1, 75).get_spent_calories()
+    training.action = 15000
+    training.duration_h = 2
+    assert training.show_training_info().calories == homework.Running(
+        15000, 2, 75).get_spent_calories(), (
+        'Сообщение должно учитывать изменённые поля.'
+    )
+
+
+@pytest.mark.parametrize('input_data, field, value, expected', [
+    (['SWM', [720, 1, 80, 25, 40]], 'count_pool', 80,
+     ['SWM', [720, 1, 80, 25, 80]]),
+    (['WLK', [9000, 1, 75, 180]], 'height_cm', 20,
+     ['WLK', [9000, 1, 75, 20]]),
+    (['RUN', [9000, 1, 75]], 'weight_kg', 90,
+     ['RUN', [9000, 1, 90]]),
+])
+def test_show_training_info_after_change(input_data, field, value, expected):
+    training = homework.read_package(*input_data)
+    before = training.show_training_info()
+    setattr(training, field, value)
+    after = training.show_training_info()
+    assert after != before
+    assert after == homework.read_package(*expected).show_training_info(), (
+        'Сообщение должно учитывать изменённые поля.'
+    )
+
+
+def test_TrainingAggregator():
+    first = homework.TrainingAggregator()
+    second = homework.TrainingAggregator()
+    first.add(homework.read_package('RUN', [9000, 1, 75])
+              .show_training_info(), user=1, day='2021-10-01')
+    second.add(homework.read_package('RUN', [15000, 3, 75])
+               .show_training_info(), user=1, day='2021-10-01')
+    second.add_batch(
+        homework.compute_batch('SWM', {
+            'action': [720, 420], 'duration': [1, 4], 'weight': [80, 20],
+            'length_pool': [25, 42], 'count_pool': [40, 4],
+        }),
+        users=[1, 2], days=['2021-10-01', '2021-10-01']
+    )
+    summary = first.merge(second).summary()
+    assert set(summary) == {
+        (1, '2021-10-01', 'Running'),
+        (1, '2021-10-01', 'Swimming'),
+        (2, '2021-10-01', 'Swimming'),
+    }
+    running = summary[(1, '2021-10-01', 'Running')]
+    assert running.duration == 4
+    assert running.distance == pytest.approx(5.85 + 9.75)
+    assert running.speed == pytest.approx((5.85 + 9.75) / 4), (
+        'Средняя скорость должна взвешиваться по длительности.'
+    )
+    assert first.totals[(1, '2021-10-01', 'Running')].count == 2
+    assert summary[(1, '2021-10-01', 'Swimming')].calories == 336.0
+
+
+def test_ResultCache(tmp_path):
+    path = tmp_path / 'results.sqlite'
+    with homework.ResultCache(maxsize=2, path=path) as cache:
+        first = cache.get('SWM', [720, 1, 80, 25, 40])
+        assert cache.get('SWM', [720.0, 1, 80, 25, 40]) is first, (
+            'Повторный пакет должен возвращаться из кэша.'
+        )
+        cache.get('RUN', [15000, 1, 75])
+        cache.get('WLK', [9000, 1, 75, 180])
+        assert cache.get_stats() == {
+            'hits': 1, 'disk_hits': 0, 'misses': 3, 'size': 2
+        }
+        cache.get('SWM', [720, 1, 80, 25, 40])
+        assert cache.disk_hits == 1, (
+            'Вытесненное сообщение должно читаться с диска.'
+        )
+    with homework.ResultCache(path=path) as cache:
+        info = cache.get('RUN', [15000, 1, 75])
+        assert cache.get_stats()['disk_hits'] == 1
+    assert info == homework.read_package(
+        'RUN', [15000, 1, 75]).show_training_info()
+
+
+def test_ResultCache_shared_path(tmp_path):
+    path = tmp_path / 'results.sqlite'
+    first = homework.ResultCache(path=path)
+    second = homework.ResultCache(path=path)
+    try:
+        first.get('RUN', [15000, 1, 75])
+        second.get('SWM', [720, 1, 80, 25, 40])
+        assert second.get('RUN', [15000, 1, 75]) == first.get(
+            'RUN', [15000, 1, 75]
+        )
+        assert second.disk_hits == 1, (
+            'Запись одного кэша должна сразу быть видна другому.'
+        )
+        first.get('SWM', [720, 1, 80, 25, 40])
+        assert first.disk_hits == 1
+    finally:
+        second.close()
+    first.connection = None
+    with homework.ResultCache(path=path) as cache:
+        cache.get('RUN', [15000, 1, 75])
+        assert cache.disk_hits == 1, (
+            'Записи не должны теряться без закрытия кэша.'
+        )
+
+
+@pytest.fixture
+def instrumentation(monkeypatch):
+    instrumentation = homework.Instrumentation()
+    monkeypatch.setattr(homework, 'INSTRUMENTATION', instrumentation)
+    yield instrumentation
+    instrumentation.disable()
+
+
+def test_instrumentation(instrumentation):
+    raw_read_package = homework.read_package
+    homework.read_package('RUN', [15000, 1, 75]).show_training_info()
+    assert instrumentation.snapshot() == {}, (
+        'Выключенный сбор метрик не должен ничего учитывать.'
+    )
+    instrumentation.enable()
+    info = homework.read_package('RUN', [15000, 1, 75]).show_training_info()
+    info.get_message()
+    homework.read_package('SWM', [720, 1, 80, 25, 40]).get_spent_calories()
+    with pytest.raises(KeyError):
+        homework.read_package('XXX', [1, 2, 3])
+
+    class Hiking(homework.Running):
+        def get_spent_calories(self, speed=None) -> float:
+            return 1.0
+
+    Hiking(1000, 1, 75).get_spent_calories()
+    snapshot = instrumentation.snapshot()
+    assert snapshot['get_spent_calories']['Hiking']['calls'] == 1, (
+        'Подкласс, объявленный при включённом сборе, тоже учитывается.'
+    )
+    assert snapshot['read_package']['RUN']['calls'] == 1
+    assert snapshot['read_package']['unknown']['errors'] == 1, (
+        'Неизвестные коды должны учитываться под одной меткой.'
+    )
+    assert snapshot['show_training_info']['Running']['calls'] == 1
+    assert snapshot['get_spent_calories']['Running']['calls'] == 1
+    assert snapshot['get_spent_calories']['Swimming']['calls'] == 1
+    assert snapshot['get_message']['Running']['calls'] == 1
+    assert json.loads(instrumentation.to_json()) == snapshot
+    prometheus = instrumentation.to_prometheus()
+    assert ('homework_calls_total{path="read_package",label="RUN"} 1'
+            in prometheus)
+    assert ('homework_latency_seconds_bucket'
+            '{path="read_package",label="RUN",le="+Inf"} 1' in prometheus)
+    families = [re.match(r'(# TYPE )?(homework_\w+?_(total|seconds))',
+                         line)[2] for line in prometheus.splitlines()]
+    assert families == sorted(families, key=families.index), (
+        'Строки одного семейства метрик должны идти подряд.'
+    )
+    instrumentation.disable()
+    assert homework.read_package is raw_read_package, (
+        'Выключенный сбор метрик должен вызывать исходные функции.'
+    )
+    assert homework.Running.get_spent_calories is vars(
+        homework.Running)['get_spent_calories']
+
+
+def test_instrumentation_labels(instrumentation):
+    instrumentation.enable()
+    for workout_type in ['X"}\n', 'YYY']:
+        with pytest.raises(KeyError):
+            homework.read_package(workout_type, [1, 2, 3])
+    table = homework.TrainingTable(homework.Running)
+    table.append_data([15000, 1, 75]).get_spent_calories()
+    snapshot = instrumentation.snapshot()
+    assert list(snapshot['read_package']) == ['unknown']
+    assert snapshot['read_package']['unknown']['errors'] == 2
+    assert list(snapshot['get_spent_calories']) == ['Running'], (
+        'Строка таблицы должна учитываться под типом тренировки.'
+    )
+    instrumentation.record('path', 'a\\b"c\nd', 0.0, False)
+    assert ('homework_calls_total{path="path",label="a\\\\b\\"c\\nd"} 1'
+            in instrumentation.to_prometheus()), (
+        'Значения меток должны экранироваться.'
+    )
+
+
+def test_validate_packages():
+    packages = [
+        ('SWM', [720, 1, 80, 25, 40]),
+        ('RUN', [15000, 0, 75]),
+        ('XXX', [1, 2, 3]),
+        ('WLK', [9000, 1, 75, 0]),
+        ('RUN', [15000, 1]),
+        ('RUN', [15000, '1', 75]),
+        ('RUN', [1206, 12, 6]),
+        ('WLK', [9000, 1, 75, 180]),
+        ('RUN', None),
+        (['RUN'], [15000, 1, 75]),
+        ('RUN', [15000, 1, float('nan')]),
+        ('RUN', [15000, float('inf'), 75]),
+        ('SWM', [720, 1, float('-inf'), 25, 40]),
+        ('RUN', [10**400, 1, 75]),
+    ]
+    validated = homework.validate_packages(packages)
+    assert [
+        (package.index, package.reason) for package in validated.quarantine
+    ] == [
+        (1, 'duration_not_positive'),
+        (2, 'unknown_type'),
+        (3, 'height_not_positive'),
+        (4, 'wrong_length'),
+        (5, 'not_number'),
+        (8, 'data_not_sequence'),
+        (9, 'type_not_string'),
+        (10, 'weight_not_finite'),
+        (11, 'duration_not_finite'),
+        (12, 'weight_not_finite'),
+        (13, 'number_too_large'),
+    ], 'Некорректные пакеты должны попадать в карантин с кодом причины.'
+    assert {
+        code: list(indexes) for code, indexes in validated.indexes.items()
+    } == {'SWM': [0], 'RUN': [6], 'WLK': [7]}
+    results = validated.compute()
+    for code, indexes in validated.indexes.items():
+        assert list(results[code].calories) == [
+            homework.read_package(*packages[index]).get_spent_calories()
+            for index in indexes
+        ]
+
+
+def test_export_npz_streaming(tmp_path):
+    size = 50_000
+    rows = (('Running', float(index), 1.0, 2.0, 3.0)
+            for index in range(size))
+    tracemalloc.start()
+    try:
+        homework.export_npz(tmp_path / 'results.npz', rows, chunk_size=100)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert peak < size * 8, (
+        'Экспорт .npz должен держать в памяти порцию, а не все колонки.'
+    )
+    columns = homework.load_npz(tmp_path / 'results.npz')
+    assert columns['training_type'][-1] == 'Running'
+    assert columns['duration'][-1] == size - 1
+
+
+def test_export_columns(tmp_path):
+    messages = [
+        homework.read_package(*package).show_training_info()
+        for package in [('SWM', [720, 1, 80, 25, 40]),
+                        ('RUN', [1206, 12, 6])]
+    ]
+    batch = homework.compute_batch('WLK', {
+        'action': [9000, 420], 'duration': [1, 4],
+        'weight': [75, 20], 'height': [180, 42],
+    })
+    rows = list(homework.iter_message_rows(messages))
+    rows += list(homework.iter_batch_rows(batch))
+
+    npz_path = tmp_path / 'results.npz'
+    assert homework.export_npz(npz_path, iter(rows), chunk_size=3) == 4
+    columns = homework.load_npz(npz_path)
+    assert columns['training_type'] == [
+        'Swimming', 'Running', 'SportsWalking', 'SportsWalking'
+    ]
+    for position, field in enumerate(homework.MESSAGE_FIELDS[1:], 1):
+        assert list(columns[field]) == [row[position] for row in rows], (
+            'Колонки .npz должны читаться без потери точности.'
+        )
+    with zipfile.ZipFile(npz_path) as archive:
+        header = archive.read('calories.npy')[:128]
+    assert header.startswith(b'\x93NUMPY\x01\x00')
+    assert b"'descr': '<f8'" in header
+
+    assert homework.export_npz(npz_path, iter([])) == 0
+    assert homework.load_npz(npz_path)['training_type'] == []
+
+    csv_path = tmp_path / 'results.csv'
+    assert homework.export_csv(csv_path, iter(rows), chunk_size=3) == 4
+    with open(csv_path, encoding='utf-8', newline='') as export:
+        exported = list(csv.DictReader(export))
+    assert [float(row['calories']) for row in exported] == [
+        row[4] for row in rows
+    ]
+
+
+def test_Leaderboard():
+    actions = [9000, 15000, 1206, 20000, 420]
+    first = homework.Leaderboard(size=2)
+    second = homework.Leaderboard(size=2)
+    for action in actions[:3]:
+        first.add(homework.read_package(
+            'RUN', [action, 1, 75]).show_training_info())
+    second.add_batch(homework.compute_batch('RUN', {
+        'action': actions[3:], 'duration': [1, 1], 'weight': [75, 75],
+    }))
+    second.add(homework.read_package(
+        'SWM', [720, 1, 80, 25, 40]).show_training_info())
+    leaders = first.merge(second).top('Running', 'distance')
+    assert [info.distance for info in leaders] == [
+        homework.Training(action, 1, 75).get_distance()
+        for action in [20000, 15000]
+    ], 'Таблица лидеров должна хранить K лучших результатов по убыванию.'
+    assert first.top('Running', 'calories')[0] == leaders[0]
+    assert len(first.top('Swimming', 'speed')) == 1
+    assert first.top('SportsWalking', 'speed') == []
+    with pytest.raises(KeyError):
+        first.top('Running', 'weight')
+
+
+def test_LogHistogram():
+    values = [value / 10 for value in range(-500, 1001)]
+    first = homework.LogHistogram(relative_accuracy=0.01)
+    second = homework.LogHistogram(relative_accuracy=0.01)
+    for value in values[::2]:
+        first.add(value)
+    for value in values[1::2]:
+        second.add(value)
+    restored = homework.LogHistogram.from_dict(
+        json.loads(json.dumps(second.to_dict()))
+    )
+    histogram = first.merge(restored)
+    assert histogram.count == len(values)
+    for level in (0.1, 0.5, 0.95, 0.99):
+        exact = values[int(level * (len(values) - 1))]
+        assert histogram.quantile(level) == pytest.approx(exact, rel=0.01), (
+            'Квантиль должен вычисляться с заданной относительной точностью.'
+        )
+    with pytest.raises(ValueError):
+        histogram.merge(homework.LogHistogram(relative_accuracy=0.05))
+
+
+def test_TrainingSketches():
+    sketches = homework.TrainingSketches()
+    actions = list(range(1000, 21000, 100))
+    sketches.add_batch(homework.compute_batch('RUN', {
+        'action': actions, 'duration': [1] * len(actions),
+        'weight': [75] * len(actions),
+    }))
+    other = homework.TrainingSketches()
+    other.add(homework.read_package(
+        'SWM', [720, 1, 80, 25, 40]).show_training_info())
+    restored = homework.TrainingSketches.from_json(other.to_json())
+    sketches.merge(restored)
+    speeds = homework.compute_batch('RUN', {
+        'action': actions, 'duration': [1] * len(actions),
+        'weight': [75] * len(actions),
+    }).speed
+    quantiles = sketches.quantiles('Running', 'speed')
+    assert quantiles[0.5] == pytest.approx(
+        sorted(speeds)[len(speeds) // 2 - 1], rel=0.01
+    )
+    assert sketches.quantiles('Swimming', 'calories', [0.5]) == {
+        0.5: pytest.approx(336.0, rel=0.01)
+    }
+
+
+def test_SharedTrainingRing():
+    packages = [
+        ('SWM', [720, 1, 80, 25, 40]),
+        ('RUN', [1206, 12, 6]),
+        ('WLK', [9000, 1, 75, 180]),
+    ]
+    producer = homework.SharedTrainingRing(capacity=2)
+    consumer = homework.SharedTrainingRing(name=producer.name)
+    try:
+        assert consumer.capacity == 2
+        slots = [producer.put(*package) for package in packages[:2]]
+        assert slots == [0, 1]
+        with pytest.raises(BufferError):
+            producer.put(*packages[2])
+        with pytest.raises(BufferError):
+            consumer.pop()
+        consumer.compute(slots[0])
+        assert consumer.compute_pending() == 1
+        results = [consumer.pop()]
+        producer.put(*packages[2])
+        consumer.compute_pending()
+        results += [consumer.pop(), consumer.pop()]
+        assert results == [
+            homework.read_package(*package).show_training_info()
+            for package in packages
+        ], 'Результаты должны рассчитываться в разделяемой памяти.'
+        with pytest.raises(BufferError):
+            consumer.pop()
+    finally:
+        consumer.close()
+        producer.close()
+        producer.unlink()
+
+
+def test_SharedTrainingRing_other_process():
+    producer = homework.SharedTrainingRing(capacity=2)
+    try:
+        producer.put('RUN', [15000, 1, 75])
+        script = ('import homework\n'
+                  f'ring = homework.SharedTrainingRing(name={producer.name!r})\n'
+                  'print(ring.compute_pending())\n'
+                  'ring.close()\n')
+        result = subprocess.run(
+            [sys.executable, '-c', script], capture_output=True, text=True,
+            cwd=Path(homework.__file__).parent, timeout=60, check=True)
+        assert result.stdout.strip() == '1'
+        assert 'leaked' not in result.stderr, (
+            'Подключившийся процесс не должен владеть разделяемой памятью.'
+        )
+        assert producer.pop() == homework.read_package(
+            'RUN', [15000, 1, 75]).show_training_info()
+    finally:
+        producer.close()
+        producer.unlink()
+
+
+def test_SharedTrainingRing_invalid_record():
+    ring = homework.SharedTrainingRing(capacity=2)
+    try:
+        with pytest.raises(ValueError):
+            ring.put('RUN', [15000, 0, 75])
+        with pytest.raises(ValueError):
+            ring.put('SWM', [720, 1, float('nan'), 25, 40])
+        ring.put('RUN', [15000, 1, 75])
+        assert ring.compute_pending() == 1
+        assert ring.pop() == homework.read_package(
+            'RUN', [15000, 1, 75]).show_training_info(), (
+            'Некорректная запись не должна застревать в буфере.'
+        )
+    finally:
+        ring.close()
+        ring.unlink()
+
+
+def test_ResultStore():
+    day = 24 * 60 * 60
+    store = homework.ResultStore()
+    swim = homework.read_package(
+        'SWM', [720, 1, 80, 25, 40]).show_training_info()
+    run = homework.read_package('RUN', [15000, 1, 75]).show_training_info()
+    store.append(swim, user='x', timestamp=10 * day)
+    store.append(run, user='x', timestamp=11 * day)
+    store.append(swim, user='y', timestamp=11 * day)
+    store.append(swim, user='x', timestamp=3 * day)
+    store.add_batch(
+        homework.compute_batch('SWM', {
+            'action': [720, 1440], 'duration': [1, 2], 'weight': [80, 80],
+            'length_pool': [25, 25], 'count_pool': [40, 80],
+        }),
+        users=['x', 'x'], timestamps=[12 * day, 5 * day]
+    )
+    assert len(store) == 6
+    last_week = store.query('x', 'Swimming', start=6 * day, end=13 * day)
+    assert [stored.timestamp for stored in last_week] == [10 * day, 12 * day]
+    assert last_week[0].info == swim, (
+        'Хранилище должно возвращать сохранённые сообщения.'
+    )
+    everything = store.query('x')
+    assert [stored.timestamp for stored in everything] == [
+        3 * day, 5 * day, 10 * day, 11 * day, 12 * day
+    ], 'Результаты должны возвращаться в порядке времени.'
+    assert everything[3].info.training_type == 'Running'
+    assert store.query('z') == []
+
+
+@pytest.mark.parametrize('exact', [True, False])
+def test_PacketDeduplicator(exact):
+    packages = [
+        ('tracker-1', 'RUN', [15000, 1, 75]),
+        ('tracker-1', 'RUN', [15000.0, 1, 75]),
+        ('tracker-2', 'RUN', [15000, 1, 75]),
+        ('tracker-1', 'SWM', [720, 1, 80, 25, 40]),
+        ('tracker-1', 'SWM', [720, 1, 80, 25, 40]),
+    ]
+    deduplicator = homework.PacketDeduplicator(capacity=100, exact=exact)
+    unique = list(deduplicator.filter(packages))
+    assert unique == [packages[0], packages[2], packages[3]], (
+        'Повторно присланные пакеты должны отсеиваться.'
+    )
+    assert deduplicator.duplicates == 2
+    messages = list(homework.iter_messages(
+        (workout_type, data) for _, workout_type, data in unique
+    ))
+    assert len(messages) == 3
+
+
+def test_PacketDeduplicator_window():
+    now = [0.0]
+    deduplicator = homework.PacketDeduplicator(
+        capacity=100, window=60, clock=lambda: now[0]
+    )
+    package = ('tracker-1', 'RUN', [15000, 1, 75])
+    assert not deduplicator.is_duplicate(*package)
+    now[0] = 90
+    assert deduplicator.is_duplicate(*package), (
+        'Пакет должен помниться в течение окна.'
+    )
+    now[0] = 200
+    deduplicator.is_duplicate('tracker-2', 'RUN', [1, 1, 1])
+    assert not deduplicator.is_duplicate(*package), (
+        'Пакет должен забываться после двух окон.'
+    )
+
+
+def test_PacketDeduplicator_idle_gap():
+    now = [0.0]
+    deduplicator = homework.PacketDeduplicator(
+        capacity=100, window=60, clock=lambda: now[0]
+    )
+    package = ('tracker-1', 'RUN', [15000, 1, 75])
+    assert not deduplicator.is_duplicate(*package)
+    now[0] = 130
+    assert not deduplicator.is_duplicate(*package), (
+        'После простоя дольше двух окон пакет должен забываться.'
+    )
+    now[0] = 140
+    assert deduplicator.is_duplicate(*package)
+
+
+def test_BloomFilter_error_rate():
+    bloom = homework.BloomFilter(capacity=2000, error_rate=0.01)
+    for number in range(2000):
+        bloom.add(homework.PacketDeduplicator.make_fingerprint(
+            'device', 'RUN', [number, 1, 75]))
+    false_positives = sum(
+        homework.PacketDeduplicator.make_fingerprint(
+            'device', 'RUN', [number, 1, 75]) in bloom
+        for number in range(2000, 12000)
+    )
+    assert false_positives / 10000 < 0.02